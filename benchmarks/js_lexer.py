@@ -0,0 +1,52 @@
+"""
+Time of the JavaScript lexer against the regex extractor, on the .js files in a directory, and on inputs that make
+naive regexes backtrack. The time for those should double when the input doubles.
+
+    python benchmarks/js_lexer.py path/to/django/contrib/admin/static
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+pathological_sources = {
+    'unterminated string': lambda n: "gettext('" + "a\\'" * n + "\n",
+    'unterminated comments': lambda n: "/*" * n,
+    'regex literal or division': lambda n: "a = [/" * n,
+    'template substitutions': lambda n: "`${" * n,
+    'quotes': lambda n: "'\"" * n,
+}
+
+
+def seconds(parse_function, sources):
+    start = time.perf_counter()
+    for source in sources:
+        list(parse_function(source))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', help='directory with .js files')
+    parser.add_argument('--size', type=int, default=50_000, help='repetitions in the pathological inputs')
+    args = parser.parse_args()
+
+    from django.conf import settings
+    settings.configure()
+    import okrand
+
+    if args.path:
+        sources = [x.read_text(encoding='utf-8') for x in sorted(Path(args.path).rglob('*.js'))]
+        print(f'{len(sources)} files, {sum(len(x) for x in sources)} characters')
+        for parse_function in [okrand.parse_js, okrand.parse_js_regex]:
+            print(f'    {parse_function.__name__:<16} {seconds(parse_function, sources):6.2f}s')
+
+    for name, make_source in pathological_sources.items():
+        times = [seconds(okrand.parse_js, [make_source(size)]) for size in (args.size, args.size * 2)]
+        print(f'{name:<28} {times[0]:6.2f}s, twice as big: {times[1]:6.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Time of the bulk PO parser against the state machine parser it falls back to, on a synthetic file or the .po files
+given, and a check that they give the same result.
+
+    python benchmarks/po_parser.py --entries 20000
+    python benchmarks/po_parser.py locale/*/LC_MESSAGES/django.po
+"""
+import argparse
+import gc
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from okrand._vendored.polib import (  # noqa: E402
+    _BulkPOFileParser,
+    _POFileParser,
+)
+
+
+def synthetic_po_file(entries):
+    return '# Header\nmsgid ""\nmsgstr ""\n"Language: sv\\n"\n\n' + ''.join(
+        f'#: foo/bar.py:{i} foo/baz.py:{i}\n'
+        f'{"#, python-format" if i % 3 else "#. generated"}\n'
+        f'msgid "Message number %(number)s of the project, {i}"\n'
+        f'msgstr ""\n'
+        f'"Meddelande nummer %(number)s av projektet, \\"{i}\\"\\n"\n'
+        f'"on two lines"\n\n'
+        for i in range(entries)
+    )
+
+
+def best_of(parser, content, repeat):
+    # Like timeit, garbage collection is off while timing
+    gc.disable()
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            po = parser(content).parse()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(times), po
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', help='.po files, instead of the synthetic one')
+    parser.add_argument('--entries', type=int, default=20_000, help='entries in the synthetic file')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.paths:
+        sources = {path: Path(path).read_text(encoding='utf-8') for path in args.paths}
+    else:
+        sources = {f'{args.entries} synthetic entries': synthetic_po_file(args.entries)}
+
+    for name, content in sources.items():
+        fsm_seconds, expected = best_of(_POFileParser, content, args.repeat)
+        bulk_seconds, po = best_of(_BulkPOFileParser, content, args.repeat)
+        same = str(po) == str(expected) and po.metadata == expected.metadata
+        print(f'{name}: state machine {fsm_seconds:6.2f}s, bulk {bulk_seconds:6.2f}s, {fsm_seconds / bulk_seconds:.1f}x{"" if same else ", DIFFERENT RESULT"}')
+
+
+if __name__ == '__main__':
+    main()
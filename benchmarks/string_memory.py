@@ -0,0 +1,99 @@
+"""
+Peak memory for keeping the strings of a synthetic project with many call sites, with the old representation of
+extracted strings (a dataclass with a __dict__, a new msgid per call site) and the current one (slotted, interned).
+
+    python benchmarks/string_memory.py --call-sites 500000
+
+Each representation is measured in its own process, since peak RSS never goes down.
+"""
+import argparse
+import resource
+import subprocess
+import sys
+from dataclasses import (
+    dataclass,
+    field,
+)
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@dataclass(kw_only=True, frozen=True)
+class _OldString:
+    domain: str
+    msgid: str
+    translation_function: str
+    msgid_plural: str = None
+    context: str = ''
+    line: int = field(default=None, compare=False)
+
+
+def old_string(*, msgid, translation_function, msgid_plural=None, context='', domain, line=None):
+    import okrand
+
+    return _OldString(
+        msgid=okrand.normalize(msgid),
+        translation_function=translation_function,
+        msgid_plural=okrand.normalize(msgid_plural),
+        context=context,
+        domain=domain,
+        line=line,
+    )
+
+
+def synthetic_files(*, call_sites, unique, calls_per_file=1000):
+    # Built from parts so this file doesn't contain translation function calls itself
+    function = 'get' + 'text'
+    for start in range(0, call_sites, calls_per_file):
+        yield ''.join(
+            f"const x{i} = {function}('This is message number {i % unique} of the project')\n"
+            for i in range(start, min(call_sites, start + calls_per_file))
+        )
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(representation, *, call_sites, unique):
+    import okrand
+
+    if representation == 'old':
+        okrand.String = old_string
+
+    before = peak_rss_kb()
+    strings = []
+    for content in synthetic_files(call_sites=call_sites, unique=unique):
+        strings.extend(okrand.parse_js(content))
+    assert len(strings) == call_sites
+    return peak_rss_kb() - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--call-sites', type=int, default=500_000)
+    parser.add_argument('--unique', type=int, default=20_000, help='number of unique msgids')
+    parser.add_argument('--representation', choices=['old', 'current'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.representation:
+        print(measure(args.representation, call_sites=args.call_sites, unique=args.unique))
+        return
+
+    print(f'{args.call_sites} call sites, {args.unique} unique msgids')
+    results = {}
+    for representation in ['old', 'current']:
+        output = subprocess.run(
+            [sys.executable, __file__, '--representation', representation, '--call-sites', str(args.call_sites), '--unique', str(args.unique)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[representation] = int(output.strip())
+        print(f'    {representation:<8} peak RSS growth: {results[representation] / 1024:8.1f} MB')
+    print(f'    saved {(1 - results["current"] / results["old"]) * 100:.0f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,53 @@
 __version__ = '1.5.0'
 
 import ast
+import hashlib
 import importlib
+import io
+import mmap
 import os
+import pickle
 import re
+import subprocess
+import sys
+import time
+import tokenize
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
 from configparser import (
     ConfigParser,
     NoSectionError,
 )
+from contextlib import contextmanager
 from dataclasses import (
     dataclass,
     field,
     fields,
+    replace,
+)
+from enum import Enum
+from functools import lru_cache
+from importlib.metadata import entry_points
+from pathlib import (
+    Path,
+    PurePosixPath,
+)
+from types import MappingProxyType
+from typing import (
+    Callable,
+    List,
 )
-from pathlib import Path
-from typing import List
 
 from django.apps.registry import apps as registry_apps
 from django.conf import settings
 from django.template import Template
 from django.template.base import (
+    Lexer,
     tag_re,
     TokenType,
 )
@@ -31,6 +59,7 @@ from django.templatetags.i18n import (
     TranslateNode,
 )
 from django.utils.functional import Promise
+from django.utils.text import unescape_string_literal
 from gitignorefile import Cache
 
 from okrand._vendored.polib import (
@@ -44,6 +73,18 @@ class OkrandException(Exception):
     pass
 
 
+class UnknownExtractorException(OkrandException):
+    pass
+
+
+class UnknownFileEnumerationException(OkrandException):
+    pass
+
+
+class GitException(OkrandException):
+    pass
+
+
 def read_config(filename='setup.cfg'):
     config_parser = ConfigParser()
     config_parser.read(filename)
@@ -74,11 +115,17 @@ def should_process_model(model, prefixes):
     return False
 
 
-def translations_for_all_models():
+def models_to_process():
     prefixes = get_conf_list('django_model_prefixes')
-    for model in registry_apps.get_models():
-        if not should_process_model(model=model, prefixes=prefixes):
-            continue
+    return [
+        model
+        for model in registry_apps.get_models()
+        if should_process_model(model=model, prefixes=prefixes)
+    ]
+
+
+def translations_for_all_models():
+    for model in models_to_process():
         yield from translations_for_model(model)
 
 
@@ -117,14 +164,63 @@ def _translations_for_model_fields(model):
             )
 
 
-def walk_respecting_gitignore(path):
+def walk_respecting_gitignore(path, *, ignore_matcher=None):
     ignored = Cache()
     for root, dirs, files in os.walk(path):
-        dirs[:] = [x for x in dirs if not ignored(x) and not x == '.git']
-        files[:] = [x for x in files if not ignored(x)]
+        dirs[:] = [x for x in dirs if not x == '.git' and not ignored(os.path.join(root, x), is_dir=True)]
+        if ignore_matcher is not None:
+            dirs[:] = [x for x in dirs if not ignore_matcher.ignores_directory(Path(root) / x)]
+        files[:] = [x for x in files if not ignored(os.path.join(root, x), is_dir=False)]
         yield root, dirs, files
 
 
+def _git_ls_files(path, *args):
+    result = subprocess.run(['git', 'ls-files', '-z', *args], cwd=path, capture_output=True, check=True)
+    return [os.fsdecode(x) for x in result.stdout.split(b'\0') if x]
+
+
+def git_files(path):
+    """
+    The files below `path` that git knows about and doesn't ignore: tracked files that aren't deleted, and untracked
+    files. Returns None if `path` isn't in a git checkout, or git isn't available.
+    """
+    try:
+        files = _git_ls_files(path, '--cached', '--others', '--exclude-standard')
+        deleted = set(_git_ls_files(path, '--deleted'))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    # Unmerged files are listed once per stage
+    return [x for x in dict.fromkeys(files) if x not in deleted]
+
+
+def git_changed_files(path, ref):
+    """
+    The files below `path` that differ from `ref`, including untracked files, as full paths.
+    """
+    try:
+        result = subprocess.run(['git', 'diff', '--name-only', '--relative', '-z', ref, '--'], cwd=path, capture_output=True, check=True)
+        untracked = _git_ls_files(path, '--others', '--exclude-standard')
+    except OSError as e:
+        raise GitException(f'Could not run git: {e}')
+    except subprocess.CalledProcessError as e:
+        raise GitException(f'Could not get the files changed since {ref}: {e.stderr.decode(errors="replace").strip()}')
+
+    changed = [os.fsdecode(x) for x in result.stdout.split(b'\0') if x]
+    return {Path(path) / x for x in [*changed, *untracked]}
+
+
+def git_commit(path, ref='HEAD'):
+    """
+    The id of the commit `ref` points to, or None if there's no such commit, or `path` isn't in a git checkout.
+    """
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}'], cwd=path, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode().strip()
+
+
 gettext_synonyms = {
     '_',
     'gettext',
@@ -138,28 +234,196 @@ gettext_synonyms = {
 }
 
 
-@dataclass(kw_only=True, frozen=True)
+class _StrEnum(str, Enum):
+    # Members compare, hash and format like their values, so they can be used anywhere a plain string was used before
+    __str__ = str.__str__
+    __format__ = str.__format__
+    __hash__ = str.__hash__
+
+
+class Domain(_StrEnum):
+    django = 'django'
+    djangojs = 'djangojs'
+
+
+class TranslationFunction(_StrEnum):
+    gettext = 'gettext'
+    ngettext = 'ngettext'
+    pgettext = 'pgettext'
+    npgettext = 'npgettext'
+    template_underscore = 'template _()'
+    trans = '{% trans %}'
+    blocktrans = '{% blocktrans %}'
+
+
+domain_by_value = {x.value: x for x in Domain}
+translation_function_by_value = {x.value: x for x in TranslationFunction}
+
+
+@dataclass(kw_only=True, frozen=True, slots=True)
 class _String:
     domain: str
     msgid: str
     translation_function: str
     msgid_plural: str = None
     context: str = ''
+    # Where the string was found. Not part of the identity of the string.
+    line: int = field(default=None, compare=False)
 
 
-def String(*, msgid, translation_function, msgid_plural=None, context='', domain):
+def _intern(value):
+    # str.__str__ makes a plain str out of subclasses like SafeString, which can't be interned
+    return sys.intern(str.__str__(value)) if value else value
+
+
+def String(*, msgid, translation_function, msgid_plural=None, context='', domain, line=None):
+    """
+    The same msgid found in many places is stored once, and the domain and translation function are shared enum
+    members when they are the built in ones. Plugins can use any string for them.
+    """
     assert msgid is not None
     assert not isinstance(msgid, Promise)
     assert not isinstance(msgid_plural, Promise)
     return _String(
-        msgid=normalize(msgid),
-        translation_function=translation_function,
-        msgid_plural=normalize(msgid_plural),
-        context=context,
-        domain=domain,
+        msgid=_intern(normalize(msgid)),
+        translation_function=translation_function_by_value.get(translation_function) or _intern(translation_function),
+        msgid_plural=_intern(normalize(msgid_plural)),
+        context=_intern(context),
+        domain=domain_by_value.get(domain) or _intern(domain),
+        line=line,
     )
 
 
+class UniqueStrings:
+    """
+    The extracted strings with one entry per domain and msgid. Strings are added as they are found, so memory use
+    depends on the number of unique strings, not the number of places they are used. Like before, the last string
+    found for a msgid wins, but the order is that of the first time it was found.
+
+    With `track_sources` the files and lines each string was found on are kept too. This is needed for occurrences
+    in the .po files, and to be able to replace the strings of a single file.
+    """
+
+    def __init__(self, strings=(), *, track_sources=False):
+        self.string_by_msgid_by_domain = {}
+        self.track_sources = track_sources
+        # (domain, msgid) -> {path: [string, lines]}. The path is None for strings that aren't from a file, like models.
+        self.sources_by_key = {}
+        # path -> the (domain, msgid) keys found in that file
+        self.keys_by_path = {}
+        self.add(strings)
+
+    def add(self, strings, *, path=None):
+        for s in strings:
+            string_by_msgid = self.string_by_msgid_by_domain.get(s.domain)
+            if string_by_msgid is None:
+                string_by_msgid = self.string_by_msgid_by_domain[s.domain] = {}
+            string_by_msgid[s.msgid] = s
+
+            if not self.track_sources:
+                continue
+
+            key = (s.domain, s.msgid)
+            sources = self.sources_by_key.setdefault(key, {})
+            source = sources.get(path)
+            if source is None:
+                source = sources[path] = [s, []]
+            else:
+                source[0] = s
+            if s.line is not None:
+                source[1].append(s.line)
+            self.keys_by_path.setdefault(path, {})[key] = None
+
+    def remove(self, path):
+        """
+        Removes the strings found in a file. Returns what was removed as {(domain, msgid): [string, lines]}.
+        """
+        removed = {}
+        for key in self.keys_by_path.pop(path, ()):
+            domain, msgid = key
+            sources = self.sources_by_key[key]
+            removed[key] = sources.pop(path)
+            if sources:
+                # The last string found wins
+                self.string_by_msgid_by_domain[domain][msgid] = next(reversed(sources.values()))[0]
+            else:
+                del self.sources_by_key[key]
+                del self.string_by_msgid_by_domain[domain][msgid]
+        return removed
+
+    def replace(self, path, strings, *, compare_lines=True):
+        """
+        Replaces the strings found in a file. Only the msgids the file had before or has now are looked at, so the
+        cost doesn't depend on the size of the project. Returns the domains that changed.
+        """
+        assert self.track_sources
+        old_sources = self.remove(path)
+        self.add(strings, path=path)
+
+        changed_domains = set()
+        for key in old_sources.keys() | self.keys_by_path.get(path, {}).keys():
+            old = old_sources.get(key)
+            new = self.sources_by_key.get(key, {}).get(path)
+            if old is None or new is None or old[0] != new[0] or (compare_lines and old[1] != new[1]):
+                changed_domains.add(key[0])
+        return changed_domains
+
+    def occurrences(self, domain, msgid):
+        return [
+            (path, line)
+            for path, (s, lines) in self.sources_by_key.get((domain, msgid), {}).items()
+            if path is not None
+            for line in lines
+        ]
+
+    def string_by_msgid(self, domain):
+        return self.string_by_msgid_by_domain.get(domain, {})
+
+    def __iter__(self):
+        for string_by_msgid in self.string_by_msgid_by_domain.values():
+            yield from string_by_msgid.values()
+
+    def __len__(self):
+        return sum(len(x) for x in self.string_by_msgid_by_domain.values())
+
+
+@dataclass(frozen=True, kw_only=True)
+class StringIndex:
+    """
+    The extracted strings partitioned by domain, built once and shared read-only by all languages, so the cost per
+    language only depends on the size of its catalog. It's plain data, so it can be sent to worker processes too.
+    """
+    string_by_msgid_by_domain: dict
+    # (domain, msgid) -> ((path, line), ...) as written to the .po files. None when occurrences aren't written.
+    occurrences_by_key: dict = None
+
+    @classmethod
+    def build(cls, strings, *, with_occurrences=False):
+        if isinstance(strings, StringIndex):
+            return strings
+        if not isinstance(strings, UniqueStrings):
+            strings = UniqueStrings(strings)
+
+        occurrences_by_key = None
+        if with_occurrences and strings.track_sources:
+            occurrences_by_key = {
+                key: tuple((path, str(line)) for path, line in strings.occurrences(*key))
+                for key in strings.sources_by_key
+            }
+
+        return cls(
+            # Copied, so later changes to the UniqueStrings, like in watch mode, don't show up here
+            string_by_msgid_by_domain={domain: dict(x) for domain, x in strings.string_by_msgid_by_domain.items()},
+            occurrences_by_key=occurrences_by_key,
+        )
+
+    def string_by_msgid(self, domain):
+        return MappingProxyType(self.string_by_msgid_by_domain.get(domain, {}))
+
+    def occurrences(self, domain, msgid):
+        return self.occurrences_by_key.get((domain, msgid), ())
+
+
 def strip_suffix(s, *, suffix):
     if s.endswith(suffix):
         return s[:-len(suffix)]
@@ -190,6 +454,7 @@ def parse_python(content):
                     msgid=node.args[0].value,
                     translation_function=func,
                     domain='django',
+                    line=node.lineno,
                 )
             elif func == 'pgettext':
                 yield String(
@@ -197,6 +462,7 @@ def parse_python(content):
                     translation_function=func,
                     context=node.args[0].value,
                     domain='django',
+                    line=node.lineno,
                 )
             elif func == 'ngettext':
                 yield String(
@@ -204,6 +470,7 @@ def parse_python(content):
                     translation_function=func,
                     msgid_plural=node.args[1].value,
                     domain='django',
+                    line=node.lineno,
                 )
             elif func == 'npgettext':
                 context = node.args[0].value
@@ -213,6 +480,7 @@ def parse_python(content):
                     context=context,
                     msgid_plural=node.args[2].value,
                     domain='django',
+                    line=node.lineno,
                 )
             else:  # pragma: no cover
                 assert False, f'unknown gettext flavor {func}'
@@ -233,6 +501,161 @@ def parse_python(content):
     yield from w(t)
 
 
+class _AmbiguousSource(Exception):
+    pass
+
+
+number_of_arguments_by_func = {
+    'gettext': 1,
+    'pgettext': 2,
+    'ngettext': 2,
+    'npgettext': 3,
+}
+
+
+def string_from_arguments(func, arguments, *, domain, line=None):
+    if func == 'gettext':
+        return String(
+            msgid=arguments[0],
+            translation_function=func,
+            domain=domain,
+            line=line,
+        )
+    elif func == 'pgettext':
+        return String(
+            msgid=arguments[1],
+            translation_function=func,
+            context=arguments[0],
+            domain=domain,
+            line=line,
+        )
+    elif func == 'ngettext':
+        return String(
+            msgid=arguments[0],
+            translation_function=func,
+            msgid_plural=arguments[1],
+            domain=domain,
+            line=line,
+        )
+    elif func == 'npgettext':
+        return String(
+            msgid=arguments[1],
+            translation_function=func,
+            context=arguments[0],
+            msgid_plural=arguments[2],
+            domain=domain,
+            line=line,
+        )
+    else:  # pragma: no cover
+        assert False, f'unknown gettext flavor {func}'
+
+
+def _python_string_argument(parts):
+    try:
+        # adjacent string literals are concatenated, just like the compiler does
+        value = ast.literal_eval(' '.join(parts))
+    except (ValueError, SyntaxError):
+        raise _AmbiguousSource()
+    if not isinstance(value, str):
+        raise _AmbiguousSource()
+    return value
+
+
+def _parse_python_logical_line(line):
+    calls = 0
+    # Open brackets, and if there has been a call in the current element of each of them. Used to find calls in dict
+    # keys, since the AST has all keys before all values.
+    brackets = []
+    call_in_dict_key = False
+    for i, token in enumerate(line):
+        if token.type == tokenize.OP:
+            if token.string in '([{':
+                brackets.append([token.string, False])
+            elif token.string in ')]}' and brackets:
+                brackets.pop()
+            elif token.string == ',' and brackets:
+                brackets[-1][1] = False
+            elif token.string == ':' and brackets and brackets[-1] == ['{', True]:
+                call_in_dict_key = True
+
+        if token.type == tokenize.STRING and re.match(r'\w*[fF]', token.string) and re.search(r'gettext|\b_\s*\(', token.string):
+            # calls inside f-strings are not visible in the token stream
+            raise _AmbiguousSource()
+
+        if token.type != tokenize.NAME or token.string not in gettext_synonyms:
+            continue
+        if i + 1 >= len(line) or line[i + 1].string != '(':
+            if 0 < i < len(line) - 1 and line[i + 1].string == ')' and line[i - 1].string == '(':
+                # `(gettext)('foo')` is a call too
+                raise _AmbiguousSource()
+            continue
+        if i > 0 and line[i - 1].string in ('.', 'def', 'class'):
+            continue
+
+        calls += 1
+        for bracket in brackets:
+            bracket[1] = True
+        func = normalize_func(token.string)
+        args = []
+        j = i + 2
+        while len(args) < number_of_arguments_by_func[func]:
+            parts = []
+            while j < len(line) and line[j].type == tokenize.STRING:
+                parts.append(line[j].string)
+                j += 1
+            if not parts or j >= len(line) or line[j].string not in (',', ')'):
+                raise _AmbiguousSource()
+            args.append(_python_string_argument(parts))
+            if line[j].string == ')' and len(args) < number_of_arguments_by_func[func]:
+                raise _AmbiguousSource()
+            j += 1
+
+        yield string_from_arguments(func, args, domain='django', line=token.start[0])
+
+    if calls:
+        if line[0].string in ('@', 'case') or any(x.string == '->' for x in line):
+            # decorators and return annotations come after the body in the AST, and match patterns aren't calls
+            raise _AmbiguousSource()
+        if calls > 1:
+            # The AST puts the condition of `a if b else c` first, and positional arguments before keyword arguments
+            inline_if = any(x.type == tokenize.NAME and x.string == 'if' for x in line[1:])
+            star = any(x.type == tokenize.OP and x.string in ('*', '**') for x in line)
+            if call_in_dict_key or inline_if or star:
+                raise _AmbiguousSource()
+
+
+def _parse_python_tokens(content):
+    skipped_token_types = {tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT}
+    line = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            if token.type in skipped_token_types:
+                continue
+            if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                if line:
+                    yield from _parse_python_logical_line(line)
+                line = []
+                continue
+            line.append(token)
+    except (tokenize.TokenError, SyntaxError):
+        raise _AmbiguousSource()
+
+
+def parse_python_tokens(content):
+    """
+    Finds the same strings as `parse_python`, but from the token stream instead of building the AST, which keeps memory
+    use low on big files. It's slower than `parse_python` though. Anything that can't be handled in exactly the same
+    way from the tokens makes us fall back to `parse_python` for the file.
+    """
+    try:
+        strings = list(_parse_python_tokens(content))
+    except _AmbiguousSource:
+        yield from parse_python(content)
+        return
+
+    yield from strings
+
+
 # language=pythonregexp
 find_string_regex = r'''(?x) 
     \b     # word boundary
@@ -313,13 +736,22 @@ ml_languages_find_string_regex = r'''(?x)
     '''
 
 
-def parse_js(content):
+def line_numbers(content):
+    """
+    Returns a function that gives the line number of an offset in `content`.
+    """
+    newline_offsets = [m.start() for m in re.finditer('\n', content)]
+    return lambda offset: bisect_left(newline_offsets, offset) + 1
+
+
+def parse_js_regex(content):
     # I would like to have a proper JS parser here instead of a regex, but I couldn't find one that I could use in a reasonable way
     # An idea is to use @babel/parse to parse the file and dump the strings. But this would make node and babel a dependency. This is how far I got before I decided to stop:
     # const fs = require('fs');
     # const data = fs.readFileSync('some_js.js', 'utf8');
     # parse = require('@babel/parser').parse
     # ast = parse(data)
+    line_number = line_numbers(content)
     for m in re.finditer(find_string_regex, content):
         s = m.groupdict()['string']
         func = normalize_func(m.groupdict()['func'])
@@ -329,6 +761,7 @@ def parse_js(content):
                 msgid=s,
                 translation_function=func,
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         elif func == 'pgettext':
             yield String(
@@ -336,6 +769,7 @@ def parse_js(content):
                 translation_function=func,
                 context=m.groupdict()['string'],
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         elif func == 'ngettext':
             yield String(
@@ -343,6 +777,7 @@ def parse_js(content):
                 translation_function=func,
                 msgid_plural=m.groupdict()['string2'],
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         elif func == 'npgettext':
             yield String(
@@ -351,12 +786,14 @@ def parse_js(content):
                 context=s,
                 msgid_plural=m.groupdict()['string3'],
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         else:  # pragma: no cover
             assert False, f'unknown gettext flavor {func}'
 
 
-def parse_elm(content):
+def parse_elm_regex(content):
+    line_number = line_numbers(content)
     for m in re.finditer(ml_languages_find_string_regex, content):
         s = m.groupdict()['string']
         func = normalize_func(m.groupdict()['func'])
@@ -366,6 +803,7 @@ def parse_elm(content):
                 msgid=s,
                 translation_function=func,
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         elif func == 'pgettext':
             yield String(
@@ -373,6 +811,7 @@ def parse_elm(content):
                 translation_function=func,
                 context=m.groupdict()['string'],
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         elif func == 'ngettext':
             yield String(
@@ -380,6 +819,7 @@ def parse_elm(content):
                 translation_function=func,
                 msgid_plural=m.groupdict()['string2'],
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         elif func == 'npgettext':
             yield String(
@@ -388,11 +828,418 @@ def parse_elm(content):
                 context=s,
                 msgid_plural=m.groupdict()['string3'],
                 domain='djangojs',
+                line=line_number(m.start()),
             )
         else:  # pragma: no cover
             assert False, f'unknown gettext flavor {func}'
 
 
+js_functions = {
+    'gettext',
+    'ngettext',
+    'pgettext',
+    'npgettext',
+    '_',
+}
+
+# All these are written to never backtrack, and unterminated strings and comments are consumed in one go instead of
+# being scanned for again from the next character. So scanning is linear in the size of the file. They only match
+# ASCII, so when scanning bytes other characters are never split up: they are skipped, or decoded as part of a string.
+js_string_regex = r""""[^"\\\n]*(?:\\.[^"\\\n]*)*"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"""
+js_unterminated_string_regex = r""""[^"\\\n]*(?:\\.[^"\\\n]*)*|'[^'\\\n]*(?:\\.[^'\\\n]*)*"""
+js_comment_regex = r'//[^\n]*|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/|/\*.*'
+# Names that aren't translation functions. Those can have a $ in front, like vue-gettext's $gettext, and $t is used in
+# Vue templates (see vue_function_aliases).
+js_other_name_regex = r'(?!(?:\$t|\$?(?:gettext|ngettext|pgettext|npgettext|_))(?![\w$]))[A-Za-z_$][\w$]*'
+# Most of a file can't be part of a call, so runs of tokens are matched in one go, which is a lot faster than one
+# token at a time. The last token of a run is needed to know if a / after it starts a regex literal. Outside of calls
+# and template substitutions runs include strings and brackets too.
+js_token_regex = re.compile(rf'''
+    (?P<whitespace>\s+)
+    | (?P<comment>{js_comment_regex})
+    | (?P<string>{js_string_regex})
+    | (?P<unterminated_string>{js_unterminated_string_regex})
+    | (?P<other>(?:\s*(?P<last>[0-9][\w.]*|{js_other_name_regex}|[^"'`/\w$\s{{}}(),]))+)
+    | (?P<name>[A-Za-z_$][\w$]*)
+    | (?P<punctuation>.)
+''', re.VERBOSE | re.DOTALL | re.ASCII)
+js_run_regex = re.compile(rf'''
+    (?P<whitespace>\s+)
+    | (?P<comment>{js_comment_regex})
+    | (?P<other>(?:\s*(?P<last>{js_string_regex}|{js_unterminated_string_regex}|[0-9][\w.]*|{js_other_name_regex}|[^"'`/\w$\s]))+)
+    | (?P<name>[A-Za-z_$][\w$]*)
+    | (?P<punctuation>.)
+''', re.VERBOSE | re.DOTALL | re.ASCII)
+js_template_chunk_regex = re.compile(r'[^`\\$]*(?:(?:\\.|\$(?!\{))[^`\\$]*)*', re.DOTALL)
+js_regex_literal_regex = re.compile(r'/(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+# After these a / starts a regex literal, not a division
+js_keywords_before_expression = {'return', 'typeof', 'case', 'do', 'else', 'in', 'instanceof', 'new', 'delete', 'void', 'throw', 'yield', 'await'}
+js_name_start_characters = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_$')
+
+elm_string_regex = r'''"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""|"[^"\\\n]*(?:\\.[^"\\\n]*)*"|'[^'\\\n]*(?:\\.[^'\\\n]*)*\''''
+elm_unterminated_string_regex = r'''""".*|"[^"\\\n]*(?:\\.[^"\\\n]*)*|'[^'\\\n]*(?:\\.[^'\\\n]*)*'''
+elm_comment_regex = r'--[^\n]*|\{-[^-]*-+(?:[^-}][^-]*-+)*\}|\{-.*'
+elm_other_name_regex = r'(?!(?:gettext|ngettext|pgettext|npgettext|_)(?!\w))[A-Za-z_]\w*'
+elm_token_regex = re.compile(rf'''
+    (?P<whitespace>\s+)
+    | (?P<comment>{elm_comment_regex})
+    | (?P<string>{elm_string_regex})
+    | (?P<unterminated_string>{elm_unterminated_string_regex})
+    | (?P<other>(?:\s*(?P<last>[0-9][\w.]*|{elm_other_name_regex}|[^"'\w\s{{,-]|-(?!-)|\{{(?!-)))+)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<punctuation>.)
+''', re.VERBOSE | re.DOTALL | re.ASCII)
+elm_run_regex = re.compile(rf'''
+    (?P<whitespace>\s+)
+    | (?P<comment>{elm_comment_regex})
+    | (?P<other>(?:\s*(?P<last>{elm_string_regex}|{elm_unterminated_string_regex}|[0-9][\w.]*|{elm_other_name_regex}|[^"'\w\s{{-]|-(?!-)|\{{(?!-)))+)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<punctuation>.)
+''', re.VERBOSE | re.DOTALL | re.ASCII)
+
+
+@lru_cache
+def bytes_regex(regex):
+    """
+    The same regex, but for scanning bytes. Only for patterns that are ASCII.
+    """
+    return re.compile(regex.pattern.encode(), regex.flags & ~re.UNICODE)
+
+
+@dataclass(frozen=True, kw_only=True)
+class _LexerSyntax:
+    """
+    What a lexer needs to scan either `str` or bytes, like a memory mapped file. Tokens are always yielded as `str`.
+    """
+    token_regex: re.Pattern
+    run_regex: re.Pattern
+    template_chunk_regex: re.Pattern = None
+    regex_literal_regex: re.Pattern = None
+    decode: Callable
+    backtick: str = '`'
+    open_brace: str = '{'
+    close_brace: str = '}'
+    slash: str = '/'
+    substitution: str = '${'
+    newline: str = '\n'
+    triple_quote: str = '"""'
+
+
+def _bytes_lexer_syntax(syntax):
+    return _LexerSyntax(
+        token_regex=bytes_regex(syntax.token_regex),
+        run_regex=bytes_regex(syntax.run_regex),
+        template_chunk_regex=bytes_regex(syntax.template_chunk_regex) if syntax.template_chunk_regex else None,
+        regex_literal_regex=bytes_regex(syntax.regex_literal_regex) if syntax.regex_literal_regex else None,
+        decode=lambda x: x.decode(),
+        **{
+            name: getattr(syntax, name).encode()
+            for name in ('backtick', 'open_brace', 'close_brace', 'slash', 'substitution', 'newline', 'triple_quote')
+        },
+    )
+
+
+js_syntax = _LexerSyntax(
+    token_regex=js_token_regex,
+    run_regex=js_run_regex,
+    template_chunk_regex=js_template_chunk_regex,
+    regex_literal_regex=js_regex_literal_regex,
+    decode=str,
+)
+js_bytes_syntax = _bytes_lexer_syntax(js_syntax)
+elm_syntax = _LexerSyntax(
+    token_regex=elm_token_regex,
+    run_regex=elm_run_regex,
+    decode=str,
+)
+elm_bytes_syntax = _bytes_lexer_syntax(elm_syntax)
+
+
+def count_newlines(content, start=0, end=None):
+    if end is None:
+        end = len(content)
+    if isinstance(content, (str, bytes)):
+        return content.count('\n' if isinstance(content, str) else b'\n', start, end)
+    # mmap has no count(), so count in chunks to never copy the whole file at once
+    chunk_size = 1 << 20
+    return sum(content[i:min(end, i + chunk_size)].count(b'\n') for i in range(start, end, chunk_size))
+
+
+def _is_js_regex_position(previous):
+    if previous is None:
+        return True
+    kind, value, start = previous
+    if kind == 'other':
+        # A run of other tokens, the value is its last token as it is in the content
+        value = value if isinstance(value, str) else value.decode('latin-1')
+        if value[0] in '"\'':
+            return False
+        kind = 'name' if value[0] in js_name_start_characters else 'punctuation'
+    if kind == 'name':
+        return value in js_keywords_before_expression
+    return kind == 'punctuation' and value not in ')]}'
+
+
+def _js_tokens(content, pos=0, end=None):
+    """
+    Yields (kind, value, start) for the significant tokens in JavaScript source, between `pos` and `end`. String values
+    are the literal without quotes. Tokens that can't be part of a call come in runs of kind 'other', with their last
+    token as it is in `content` as the value. `content` can also be bytes, or a memory mapped file, then only the
+    significant tokens are decoded.
+    """
+    syntax = js_syntax if isinstance(content, str) else js_bytes_syntax
+    decode = syntax.decode
+    if end is None:
+        end = len(content)
+    previous = None
+    # Inside the arguments of a possible call every token counts
+    in_call = False
+    # For each template literal we are inside a ${} substitution of: the depth of the braces in the substitution
+    template_depths = []
+    # A failed regex literal scans to the end of the line, so don't try again on the same line
+    regex_literal_failed_until = -1
+    while pos < end:
+        c = content[pos:pos + 1]
+        if c == syntax.backtick or (c == syntax.close_brace and template_depths and template_depths[-1] == 0):
+            if c == syntax.close_brace:
+                template_depths.pop()
+            start = pos
+            m = syntax.template_chunk_regex.match(content, pos + 1, end)
+            value = decode(m.group())
+            pos = m.end()
+            if content[pos:min(pos + 2, end)] == syntax.substitution:
+                template_depths.append(0)
+                pos += 2
+                previous = ('template_part', value, start)
+            else:
+                pos += 1
+                # Only a template literal without substitutions is a plain string
+                previous = ('template' if c == syntax.backtick else 'template_part', value, start)
+            in_call = in_call and previous[0] == 'template'
+            yield previous
+            continue
+
+        token_regex = syntax.token_regex if in_call or template_depths else syntax.run_regex
+        m = token_regex.match(content, pos, end)
+        kind = m.lastgroup
+        pos = m.end()
+        if kind in ('whitespace', 'comment'):
+            continue
+        if kind == 'other':
+            in_call = False
+            previous = (kind, m.group('last'), m.start())
+            yield previous
+            continue
+
+        value = m.group()
+        if kind == 'punctuation':
+            if value == syntax.slash and m.start() > regex_literal_failed_until and _is_js_regex_position(previous):
+                regex_literal = syntax.regex_literal_regex.match(content, m.start(), end)
+                if regex_literal is not None:
+                    kind = 'regex'
+                    m = regex_literal
+                    pos = m.end()
+                else:
+                    regex_literal_failed_until = content.find(syntax.newline, pos, end) % (end + 1)
+            elif value == syntax.open_brace and template_depths:
+                template_depths[-1] += 1
+            elif value == syntax.close_brace and template_depths:
+                template_depths[-1] -= 1
+
+        if kind == 'string':
+            value = decode(value[1:-1])
+        elif kind in ('name', 'punctuation'):
+            value = decode(value)
+        else:
+            # regex literals and unterminated strings can't be part of a call
+            value = None
+        in_call = kind == 'name' or (in_call and (kind == 'string' or value in ('(', ',')))
+        previous = (kind, value, m.start())
+        yield previous
+
+
+def _elm_tokens(content):
+    syntax = elm_syntax if isinstance(content, str) else elm_bytes_syntax
+    pos = 0
+    end = len(content)
+    # After a possible function name every token counts
+    in_call = False
+    while pos < end:
+        m = (syntax.token_regex if in_call else syntax.run_regex).match(content, pos)
+        kind = m.lastgroup
+        pos = m.end()
+        if kind in ('whitespace', 'comment'):
+            continue
+        if kind == 'other':
+            in_call = False
+            yield kind, None, m.start()
+            continue
+        value = m.group()
+        if kind == 'string':
+            value = syntax.decode(value[3:-3] if value.startswith(syntax.triple_quote) else value[1:-1])
+        elif kind in ('name', 'punctuation'):
+            value = syntax.decode(value)
+        else:
+            value = None
+        in_call = kind == 'name' or (in_call and (kind == 'string' or value == ','))
+        yield kind, value, m.start()
+
+
+def _calls_from_tokens(tokens, *, parenthesized):
+    """
+    Yields (func, arguments, start) for calls to translation functions with string literal arguments.
+    """
+    func = None
+    arguments = None
+    expect = None
+    func_start = None
+    for kind, value, start in tokens:
+        if func is not None:
+            if expect == 'open':
+                if kind == 'punctuation' and value == '(':
+                    expect = 'argument'
+                    continue
+                func = None
+            elif expect == 'argument':
+                if kind in ('string', 'template') and len(arguments) < 3:
+                    arguments.append(value)
+                    expect = 'separator'
+                    continue
+                if arguments:
+                    # non-string argument after the strings, like the count in `ngettext('foo', 'foos', n)`
+                    yield func, arguments, func_start
+                func = None
+            elif expect == 'separator':
+                if kind == 'punctuation' and value == ',':
+                    expect = 'argument'
+                    continue
+                closed = kind == 'punctuation' and value == ')'
+                if closed or not parenthesized:
+                    yield func, arguments, func_start
+                func = None
+                if closed:
+                    continue
+
+        if kind == 'name' and value.lstrip('$') in js_functions:
+            func = value.lstrip('$')
+            func_start = start
+            arguments = []
+            expect = 'open' if parenthesized else 'argument'
+
+    if func is not None and expect == 'separator' and not parenthesized:
+        yield func, arguments, func_start
+
+
+def _strings_from_calls(calls, *, domain, content, line=1, offset=0):
+    # Calls come in the order of the file, so the newlines can be counted as we go. `line` is the line at `offset`.
+    for func, arguments, start in calls:
+        line += count_newlines(content, offset, start)
+        offset = start
+        func = normalize_func(func)
+        if len(arguments) < number_of_arguments_by_func[func]:
+            continue
+        yield string_from_arguments(func, arguments, domain=domain, line=line)
+
+
+def parse_js(content):
+    # I would like to have a proper JS parser here, but a lexer that knows about strings, comments, template and regex
+    # literals is enough to find the calls, and is guaranteed to run in linear time.
+    yield from _strings_from_calls(_calls_from_tokens(_js_tokens(content), parenthesized=True), domain='djangojs', content=content)
+
+
+def parse_elm(content):
+    yield from _strings_from_calls(_calls_from_tokens(_elm_tokens(content), parenthesized=False), domain='djangojs', content=content)
+
+
+# Top level blocks of a Vue single file component. Comments are matched so tags in them are skipped.
+vue_block_regex = re.compile(r'''<!--(?:[^-]|-(?!->))*(?:-->)?|<(?P<name>[A-Za-z][\w-]*)(?P<attributes>(?:[^>"']|"[^"]*"|'[^']*')*)>''')
+vue_template_tag_regex = re.compile(r'''<(?P<close>/?)template\b(?P<attributes>(?:[^>"']|"[^"]*"|'[^']*')*)>''', re.IGNORECASE)
+# The JavaScript in a template: {{ interpolations }} and the values of directives, like :title="..." and v-if="..."
+vue_expression_regex = re.compile(r'''
+    (?P<comment><!--(?:[^-]|-(?!->))*(?:-->)?)
+    | \{\{(?P<interpolation>[^}]*(?:\}(?!\})[^}]*)*)\}\}
+    | (?<=\s)(?::|@|\#|v-)[^\s=/>]*\s*=\s*(?:"(?P<double_quoted>[^"]*)"|'(?P<single_quoted>[^']*)')
+''', re.VERBOSE)
+# vue-i18n style calls, where the key is the string in the source language
+vue_function_aliases = {
+    '$t': 'gettext',
+}
+
+
+@lru_cache
+def vue_end_tag_regex(name):
+    return re.compile(rf'</{re.escape(name)}\s*>', re.IGNORECASE)
+
+
+def _regex_for(regex, content):
+    return regex if isinstance(content, str) else bytes_regex(regex)
+
+
+def _vue_sections(content):
+    """
+    Yields (start, end) of the parts of a Vue single file component that can contain translations: the `<script>`
+    blocks, and the expressions in the `<template>`. Style and custom blocks, and the markup of the template, are
+    skipped.
+    """
+    block_regex = _regex_for(vue_block_regex, content)
+    slash = '/' if isinstance(content, str) else b'/'
+    pos = 0
+    end = len(content)
+    while (m := block_regex.search(content, pos)) is not None:
+        pos = m.end()
+        name = m.group('name')
+        if name is None or m.group('attributes').endswith(slash):
+            # comment, or self closing like <template src="./template.html" />
+            continue
+
+        name = name if isinstance(name, str) else name.decode()
+        start = pos
+        if name.lower() == 'template':
+            # Templates can contain <template> elements, so find the matching end tag
+            depth = 1
+            for tag in _regex_for(vue_template_tag_regex, content).finditer(content, pos):
+                if tag.group('close'):
+                    depth -= 1
+                elif not tag.group('attributes').endswith(slash):
+                    depth += 1
+                if depth == 0:
+                    block_end, pos = tag.start(), tag.end()
+                    break
+            else:
+                block_end = pos = end
+            for expression in _regex_for(vue_expression_regex, content).finditer(content, start, block_end):
+                group = expression.lastgroup
+                if group != 'comment':
+                    yield expression.start(group), expression.end(group)
+        else:
+            end_tag = _regex_for(vue_end_tag_regex(name), content).search(content, pos)
+            block_end, pos = (end_tag.start(), end_tag.end()) if end_tag is not None else (end, end)
+            if name.lower() == 'script':
+                yield start, block_end
+
+
+def _vue_tokens(content, pos, end):
+    for kind, value, start in _js_tokens(content, pos, end):
+        if kind == 'name':
+            value = vue_function_aliases.get(value, value)
+        yield kind, value, start
+
+
+def parse_vue(content):
+    """
+    Finds the strings in the `<script>` blocks and the template expressions of a Vue single file component. This is a
+    lot less to scan than the whole file, and avoids false matches in CSS and markup.
+    """
+    line = 1
+    offset = 0
+    for start, end in _vue_sections(content):
+        # The sections are scanned where they are, a slice would copy them out of a memory mapped file
+        line += count_newlines(content, offset, start)
+        offset = start
+        calls = _calls_from_tokens(_vue_tokens(content, start, end), parenthesized=True)
+        yield from _strings_from_calls(calls, domain='djangojs', content=content, line=line, offset=start)
+
+
 # monkeypatch fixes to Django classes
 IncludeNode.child_nodelists = ()
 BlockTranslateNode.child_nodelists = ()
@@ -417,12 +1264,14 @@ def parse_django_template(content):
     translation_underscore_function = r'''_\(['"](.*)['"]\)'''
 
     # Find `_()` calls in the template
+    line_number = line_numbers(content)
     for template_thing in re.finditer(tag_re, content):
         for m in re.finditer(translation_underscore_function, template_thing.group(0)):
             yield String(
                 msgid=m.group(1),
                 translation_function='template _()',
                 domain='django',
+                line=line_number(template_thing.start()),
             )
 
     def w(node):
@@ -431,6 +1280,7 @@ def parse_django_template(content):
                 msgid=node.filter_expression.var.literal,
                 translation_function='{% trans %}',
                 domain='django',
+                line=node.token.lineno,
             )
         elif isinstance(node, BlockTranslateNode):
             if node.plural:
@@ -442,6 +1292,7 @@ def parse_django_template(content):
                 msgid_plural=msgid_plural,
                 translation_function='{% blocktrans %}',
                 domain='django',
+                line=node.token.lineno,
             )
 
         for child_nodelist in node.child_nodelists:
@@ -453,20 +1304,217 @@ def parse_django_template(content):
     yield from w(t)
 
 
+translate_tag_names = {'trans', 'translate'}
+block_translate_tag_names = {'blocktrans', 'blocktranslate'}
+template_string_literal_regex = re.compile(r'''_\((?P<translated>"[^"\\]*(?:\\.[^"\\]*)*"|'[^'\\]*(?:\\.[^'\\]*)*')\)|(?P<literal>"[^"\\]*(?:\\.[^"\\]*)*"|'[^'\\]*(?:\\.[^'\\]*)*')''')
+
+
+def parse_django_template_tokens(content):
+    """
+    Finds the same strings as `parse_django_template`, but only uses the lexer. This means tag libraries are never
+    loaded, and no template engine needs to be configured.
+    """
+    translation_underscore_function = r'''_\(['"](.*)['"]\)'''
+
+    blocktrans = None
+    blocktrans_line = None
+    in_comment = False
+
+    for token in Lexer(content).tokenize():
+        if token.token_type == TokenType.TEXT:
+            if blocktrans is not None:
+                blocktrans[-1].append(token)
+            continue
+
+        # Find `_()` calls in the template
+        for m in re.finditer(translation_underscore_function, token.contents):
+            yield String(
+                msgid=m.group(1),
+                translation_function='template _()',
+                domain='django',
+                line=token.lineno,
+            )
+
+        if token.token_type == TokenType.VAR:
+            if blocktrans is not None:
+                blocktrans[-1].append(token)
+            continue
+
+        if token.token_type != TokenType.BLOCK:
+            continue
+
+        bits = token.split_contents()
+        tag_name = bits[0] if bits else ''
+
+        if in_comment:
+            in_comment = tag_name != 'endcomment'
+        elif blocktrans is not None:
+            if tag_name == 'plural':
+                blocktrans.append([])
+            elif tag_name in ('endblocktrans', 'endblocktranslate'):
+                singular, *plural = blocktrans
+                yield String(
+                    msgid=extract_string_from_blocktrans_tokens(singular),
+                    msgid_plural=extract_string_from_blocktrans_tokens(plural[0]) if plural else None,
+                    translation_function='{% blocktrans %}',
+                    domain='django',
+                    line=blocktrans_line,
+                )
+                blocktrans = None
+        elif tag_name == 'comment':
+            in_comment = True
+        elif tag_name in block_translate_tag_names:
+            blocktrans = [[]]
+            blocktrans_line = token.lineno
+        elif tag_name in translate_tag_names and len(bits) > 1:
+            m = template_string_literal_regex.match(bits[1])
+            if m is None:
+                print('Warning: found non-constant argument:', bits[1])
+                continue
+            yield String(
+                msgid=unescape_string_literal(m.group('translated') or m.group('literal')),
+                translation_function='{% trans %}',
+                domain='django',
+                line=token.lineno,
+            )
+
+
+def _directory_rule_prefix(rule):
+    """
+    For a rule like `<prefix>.*` returns `<prefix>`, if it's safe to split the rule like that.
+    """
+    prefix = rule[:-2]
+    # An odd number of backslashes before the dot means it's escaped
+    if not rule.endswith('.*') or (len(prefix) - len(prefix.rstrip('\\'))) % 2:
+        return None
+
+    depth = 0
+    in_class = False
+    escaped = False
+    for c in rule:
+        if escaped:
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return None
+
+    return prefix
+
+
+def _compile_alternatives(rules):
+    if not rules:
+        return []
+    try:
+        return [re.compile('|'.join(f'(?:{x})' for x in rules))]
+    except re.error:
+        # Some rules can't be combined, for example if they use global flags
+        return [re.compile(x) for x in rules]
+
+
+class IgnoreMatcher:
+    """
+    The ignore rules compiled once. Rules on the form `<prefix>.*` are also used to skip entire directories: if
+    `<prefix>` matches the path of a directory, then the rule matches everything in it.
+    """
+
+    def __init__(self, ignore_list):
+        self.file_regexes = _compile_alternatives(ignore_list)
+        self.directory_regexes = _compile_alternatives([
+            prefix
+            for prefix in (_directory_rule_prefix(x) for x in ignore_list)
+            if prefix is not None
+        ])
+
+    def ignores_file(self, full_path):
+        full_path = str(full_path)
+        return any(x.fullmatch(full_path) for x in self.file_regexes)
+
+    def ignores_directory(self, full_path):
+        full_path = str(full_path)
+        return any(x.fullmatch(full_path) or x.fullmatch(full_path + os.sep) for x in self.directory_regexes)
+
+
+@lru_cache(maxsize=8)
+def compile_ignore_list(ignore_list):
+    return IgnoreMatcher(ignore_list)
+
+
 def ignore_filename(full_path, *, ignore_list):
-    for ignore_rule in ignore_list:
-        if re.fullmatch(ignore_rule, str(full_path)):
-            return True
-    return False
+    return compile_ignore_list(tuple(ignore_list)).ignores_file(full_path)
 
 
-# TODO: pluggable stuff here
-parse_function_by_extension = {
-    '.py': parse_python,
-    '.html': parse_django_template,
-    '.vue': parse_js,
-    '.js': parse_js,
-    '.elm': parse_elm,
+python_extractors = {
+    'ast': parse_python,
+    'tokenize': parse_python_tokens,
+}
+
+
+def get_extractor_conf(name, extractors, default):
+    value = get_conf(name, default).strip()
+    if value not in extractors:
+        raise UnknownExtractorException(f'Unknown {name} configuration "{value}". Valid options: {", ".join(extractors)}')
+    return extractors[value]
+
+
+template_extractors = {
+    'template': parse_django_template,
+    'lexer': parse_django_template_tokens,
+}
+
+js_extractors = {
+    'lexer': parse_js,
+    'regex': parse_js_regex,
+}
+
+vue_extractors = {
+    'sfc': parse_vue,
+    'lexer': parse_js,
+    'regex': parse_js_regex,
+}
+
+elm_extractors = {
+    'lexer': parse_elm,
+    'regex': parse_elm_regex,
+}
+
+# (extension, setting, extractors, default) for the built in extractors
+builtin_extractor_settings = [
+    ('.py', 'python_extractor', python_extractors, 'ast'),
+    ('.html', 'template_extractor', template_extractors, 'template'),
+    ('.vue', 'vue_extractor', vue_extractors, 'sfc'),
+    ('.js', 'js_extractor', js_extractors, 'lexer'),
+    ('.elm', 'elm_extractor', elm_extractors, 'lexer'),
+]
+
+
+def get_parse_function_by_extension():
+    # Read when used, not on import, so a bad setting doesn't break importing okrand
+    return {
+        extension: get_extractor_conf(name, extractors, default)
+        for extension, name, extractors, default in builtin_extractor_settings
+    }
+
+# A file has to match the probe of its parser for the parser to run. These are a lot cheaper than a full parse, and
+# most files don't contain any translations at all.
+prefilter_probe_by_parse_function = {
+    parse_python: re.compile(r'gettext|\b_\s*\('),
+    parse_python_tokens: re.compile(r'gettext|\b_\s*\('),
+    parse_django_template: re.compile(r'{%\s*(?:block)?trans|_\('),
+    parse_django_template_tokens: re.compile(r'{%\s*(?:block)?trans|_\('),
+    parse_js: re.compile(r'gettext|\b_\s*\('),
+    parse_js_regex: re.compile(r'gettext|\b_\s*\('),
+    parse_vue: re.compile(r'gettext|\b_\s*\(|\$t\s*\('),
+    parse_elm: re.compile(r'gettext|\b_\s'),
+    parse_elm_regex: re.compile(r'gettext|\b_\s'),
 }
 
 domains = {
@@ -475,30 +1523,975 @@ domains = {
 }
 
 
-def find_source_strings(ignore_list):
-    if get_conf('django_model_upgrade', '0') in ('1', 'true'):
-        yield from translations_for_all_models()
+def import_extractor(name):
+    # Both `module.function` and the entry point style `module:function` are accepted
+    if ':' in name:
+        module_name, _, function_name = name.partition(':')
+    else:
+        module_name, _, function_name = name.rpartition('.')
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+
+@dataclass(kw_only=True)
+class _RegisteredExtractor:
+    priority: int
+    pattern: str
+    name: str
+    load: Callable
+    function: Callable = None
+
+    def get_function(self):
+        if self.function is None:
+            self.function = self.load()
+        return self.function
+
+
+class ExtractorRegistry:
+    """
+    Which extractor to use for a file. Extractors are registered for an extension, like `.ts`, or for a glob that is
+    matched against the path relative to `BASE_DIR`, like `*.jinja2` or `frontend/*.ts`. An extractor is a function
+    that takes the content of a file and yields `String`s.
+
+    Extractors are only imported the first time a file they are used for is parsed. The first registered extractor
+    that matches wins.
+    """
+
+    def __init__(self):
+        self.extractor_by_extension = {}
+        self.glob_extractors = []
+        self.extractors = []
+
+    def register(self, pattern, *, name, load):
+        extractor = _RegisteredExtractor(priority=len(self.extractors), pattern=pattern, name=name, load=load)
+        self.extractors.append(extractor)
+        if pattern.startswith('.') and not any(c in pattern for c in '*?['):
+            self.extractor_by_extension.setdefault(pattern, extractor)
+        else:
+            self.glob_extractors.append(extractor)
+
+    def find(self, full_path):
+        result = self.extractor_by_extension.get(Path(full_path).suffix)
+        if self.glob_extractors:
+            relative_path = PurePosixPath(relative_source_path(full_path))
+            for extractor in self.glob_extractors:
+                if result is not None and extractor.priority > result.priority:
+                    break
+                if relative_path.match(extractor.pattern):
+                    result = extractor
+                    break
+        return result
+
+    def matches(self, full_path):
+        return self.find(full_path) is not None
+
+    def get(self, full_path):
+        extractor = self.find(full_path)
+        return extractor.get_function() if extractor is not None else None
+
+
+@lru_cache
+def _extractor_registry(extractors_conf, builtin_extractors):
+    registry = ExtractorRegistry()
+
+    for line in extractors_conf.split('\n'):
+        if not line.strip():
+            continue
+        pattern, _, name = line.partition('=')
+        name = name.strip()
+        registry.register(pattern.strip(), name=name, load=lambda name=name: import_extractor(name))
+
+    for entry_point in entry_points(group='okrand.extractors'):
+        registry.register(entry_point.name, name=entry_point.value, load=entry_point.load)
+
+    for extension, f in builtin_extractors:
+        registry.register(extension, name=f'{f.__module__}.{f.__qualname__}', load=lambda f=f: f)
+
+    return registry
+
+
+def get_extractor_registry():
+    """
+    The extractors from the `extractors` setting, then the ones from the `okrand.extractors` entry points, and then
+    the built in ones.
+    """
+    return _extractor_registry(get_conf('extractors', ''), tuple(get_parse_function_by_extension().items()))
+
+
+@dataclass(kw_only=True)
+class ExtractionStats:
+    files_parsed: int = 0
+    files_from_cache: int = 0
+    files_skipped_by_prefilter: int = 0
+    files_deduplicated: int = 0
+    # full path -> why the file was skipped by the size, minified or generated file guards
+    files_skipped_by_guard: dict = field(default_factory=dict)
+    # None when the model strings weren't cached
+    models_from_cache: bool = None
+    # Time spent waiting for files to be read, and parsing them, in the main process
+    read_wait_seconds: float = field(default=0.0, compare=False)
+    parse_seconds: float = field(default=0.0, compare=False)
+    # name -> how long the plugin took, and the plugins whose strings came from the cache
+    plugin_seconds: dict = field(default_factory=dict, compare=False)
+    plugins_from_cache: set = field(default_factory=set, compare=False)
+
+    def add_parsed(self, full_path, *, skip_reason):
+        if skip_reason is None:
+            self.files_parsed += 1
+        elif skip_reason == 'prefilter':
+            self.files_skipped_by_prefilter += 1
+        else:
+            self.files_skipped_by_guard[str(full_path)] = skip_reason
+
+    def summary(self):
+        total = self.files_parsed + self.files_from_cache + self.files_skipped_by_prefilter + self.files_deduplicated + len(self.files_skipped_by_guard)
+        result = f'Extracted strings from {total} files ({self.files_from_cache} from cache, {self.files_deduplicated} with the same content as another file, {self.files_skipped_by_prefilter} skipped by prefilter)'
+        if self.read_wait_seconds or self.parse_seconds:
+            result += f'\nWaited {self.read_wait_seconds:.2f}s for files to be read, parsed for {self.parse_seconds:.2f}s'
+        for name, seconds in self.plugin_seconds.items():
+            result += f'\nPlugin {name}: ' + ('from cache' if name in self.plugins_from_cache else f'{seconds:.2f}s')
+        if self.models_from_cache is not None:
+            result += '\nModel strings: ' + ('from cache' if self.models_from_cache else 'extracted, the models changed')
+        if self.files_skipped_by_guard:
+            result += f'\nSkipped {len(self.files_skipped_by_guard)} files (add them to guard_allow to parse them anyway):'
+            for full_path, skip_reason in self.files_skipped_by_guard.items():
+                result += f'\n    {full_path}: {skip_reason}'
+        return result
+
+
+# Bump this when the format of the cached data changes
+CACHE_FORMAT_VERSION = 4
+
+
+def get_cache_dir():
+    cache_dir = get_conf('cache_dir')
+    if not cache_dir:
+        return None
+    return Path(settings.BASE_DIR) / cache_dir
+
+
+# The settings that change which strings are found in a file. Other settings, like sort or renames, keep the cache.
+extraction_settings = (
+    'extractors',
+    'python_extractor',
+    'template_extractor',
+    'js_extractor',
+    'vue_extractor',
+    'elm_extractor',
+    'ignore',
+    'prefilter',
+    # Files skipped by the guards aren't cached, but files that are cached haven't been checked by new guards
+    'max_file_size',
+    'skip_minified',
+    'max_average_line_length',
+    'skip_generated',
+    'guard_allow',
+)
 
-    for plugin in get_conf_list('find_source_strings_plugins'):
-        module_name, _, function_name = plugin.rpartition('.')
-        module = importlib.import_module(module_name)
-        yield from getattr(module, function_name)(ignore_list=ignore_list)
 
-    for root, dirs, files in walk_respecting_gitignore(settings.BASE_DIR):
-        for f in files:
-            extension = Path(f).suffix
-            if extension not in parse_function_by_extension:
-                continue
+def extraction_cache_stamp():
+    # Any change to okrand, the parsers or the settings that affect extraction invalidates the cache
+    parsers = [(x.pattern, x.name) for x in get_extractor_registry().extractors]
+    settings_stamp = [(name, config[name]) for name in extraction_settings if name in config]
+    stamp = repr((CACHE_FORMAT_VERSION, __version__, parsers, settings_stamp))
+    return hashlib.sha1(stamp.encode()).hexdigest()
 
+
+# Cached content that hasn't been used for this many runs is dropped
+CACHE_KEEP_RUNS = 10
+# Without cache_dir only the strings of this many recently parsed contents are kept, to find copies of them
+MEMORY_CACHE_CONTENTS = 1000
+
+
+@dataclass(frozen=True, kw_only=True)
+class _CacheEntry:
+    mtime_ns: int
+    size: int
+    content_key: tuple
+
+
+class ExtractionCache:
+    """
+    Cache of the strings found in source files. Strings are stored by content, so files with the same content are
+    parsed once and share an entry, also across branches. Paths point to their content, and are validated by mtime and
+    size. If those have changed the content hash is checked before we decide to parse the file again.
+
+    Without a `path` the cache is only kept in memory, for this run. Then only the strings of the last
+    MEMORY_CACHE_CONTENTS contents are kept, so memory use doesn't grow with the size of the project. Copies of a file
+    that are found after that are parsed again.
+
+    The cache is saved with the git commit it was built at, and the files that differed from that commit. A later run
+    that knows which files have changed since that same commit can then use the entries for the other files as they are.
+    """
+
+    def __init__(self, path=None, *, stamp=None):
+        self.path = path
+        self.stamp = stamp
+        self.changed_paths = None
+        # (commit, paths that differed from it) for the loaded cache, and for the checkout this run sees
+        self.loaded_checkout = None
+        self.checkout = None
+        self.run = 0
+        self.entries = {}
+        self.seen = set()
+        self.strings_by_content = {}
+        self.last_run_by_content = {}
+        self.content_parsed_this_run = set()
+
+    @classmethod
+    def load(cls, path, *, stamp):
+        cache = cls(path, stamp=stamp)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return cache
+
+        if not isinstance(data, dict) or data.get('stamp') != stamp:
+            return cache
+
+        cache.run = data['run'] + 1
+        cache.entries = data['entries']
+        cache.strings_by_content = data['strings_by_content']
+        cache.last_run_by_content = data['last_run_by_content']
+        cache.loaded_checkout = data.get('checkout')
+        return cache
+
+    def use_git_changes(self, base_dir, since):
+        """
+        Use the entries for files that git says haven't changed since the commit `since` without checking them. That
+        is only safe if the cache was built at that commit, otherwise the files changed between the two would give
+        stale results. Then all files are checked as usual.
+        """
+        changed_paths = git_changed_files(base_dir, since)
+        if self.loaded_checkout is None:
+            return
+        commit, paths_changed_then = self.loaded_checkout
+        if commit != git_commit(base_dir, since):
+            return
+        self.changed_paths = changed_paths | {Path(x) for x in paths_changed_then}
+
+    def record_checkout(self, base_dir):
+        if self.path is None:
+            return
+        commit = git_commit(base_dir)
+        if commit is None:
+            return
+        try:
+            changed_paths = git_changed_files(base_dir, commit)
+        except GitException:
+            return
+        self.checkout = commit, frozenset(str(x) for x in changed_paths)
+
+    def content_key(self, full_path, digest):
+        # The same content can give different strings with another extractor
+        return get_extractor_registry().find(full_path).name, digest
+
+    def _use(self, content_key):
+        strings = self.strings_by_content.get(content_key)
+        if strings is None:
+            return None
+        if self.path is None:
+            # Least recently used goes first
+            del self.strings_by_content[content_key]
+            self.strings_by_content[content_key] = strings
+        else:
+            self.last_run_by_content[content_key] = self.run
+        return strings
+
+    def _remember(self, full_path, *, stat, content_key):
+        if self.path is None:
+            # Nothing is saved, and each path is only looked up once per run
+            return
+        key = str(full_path)
+        self.entries[key] = _CacheEntry(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            content_key=content_key,
+        )
+        self.seen.add(key)
+
+    def get_unchanged(self, full_path):
+        """
+        When we know which files have changed (from git), the entries for all other files are used without checking
+        them against the file system.
+        """
+        if self.changed_paths is None or full_path in self.changed_paths:
+            return None
+
+        key = str(full_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        strings = self._use(entry.content_key)
+        if strings is not None:
+            self.seen.add(key)
+        return strings
+
+    def get(self, full_path, *, stat, digest=None):
+        """
+        Without `digest` only a file with an unchanged mtime and size is found. With `digest` any file with the same
+        content is found, including the ones parsed earlier in this run.
+        """
+        if digest is None:
+            entry = self.entries.get(str(full_path))
+            if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                return None
+            content_key = entry.content_key
+        else:
+            content_key = self.content_key(full_path, digest)
+
+        strings = self._use(content_key)
+        if strings is not None:
+            self._remember(full_path, stat=stat, content_key=content_key)
+        return strings
+
+    def is_duplicate(self, full_path, digest):
+        return self.content_key(full_path, digest) in self.content_parsed_this_run
+
+    def put(self, full_path, *, stat, digest, strings):
+        content_key = self.content_key(full_path, digest)
+        self.strings_by_content[content_key] = tuple(strings)
+        if self.path is None:
+            if len(self.strings_by_content) > MEMORY_CACHE_CONTENTS:
+                del self.strings_by_content[next(iter(self.strings_by_content))]
+        else:
+            self.last_run_by_content[content_key] = self.run
+        self.content_parsed_this_run.add(content_key)
+        self._remember(full_path, stat=stat, content_key=content_key)
+
+    def save(self):
+        if self.path is None:
+            return
+
+        # Drop entries for files that are gone or no longer processed, and content that hasn't been used in a while
+        entries = {k: v for k, v in self.entries.items() if k in self.seen}
+        last_run_by_content = {k: v for k, v in self.last_run_by_content.items() if v > self.run - CACHE_KEEP_RUNS}
+        write_pickle(
+            self.path,
+            dict(
+                stamp=self.stamp,
+                run=self.run,
+                entries=entries,
+                strings_by_content={k: self.strings_by_content[k] for k in last_run_by_content},
+                last_run_by_content=last_run_by_content,
+                checkout=self.checkout,
+            ),
+        )
+
+
+def write_pickle(path, data):
+    # Write to a temporary file first, so a crash never leaves a half written file behind
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_extraction_cache():
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return ExtractionCache()
+    return ExtractionCache.load(cache_dir / 'extraction.pickle', stamp=extraction_cache_stamp())
+
+
+def content_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def decode_source(data):
+    # Same decoding and newline handling as reading the file in text mode
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
+
+def find_source_files(ignore_list):
+    ignore_matcher = compile_ignore_list(tuple(ignore_list))
+
+    file_enumeration = get_conf('file_enumeration', 'auto').strip()
+    if file_enumeration not in ('auto', 'git', 'walk'):
+        raise UnknownFileEnumerationException(f'Unknown file_enumeration configuration "{file_enumeration}"')
+
+    extractor_registry = get_extractor_registry()
+
+    if file_enumeration != 'walk':
+        base_dir = Path(settings.BASE_DIR)
+        relative_paths = git_files(base_dir)
+        if relative_paths is not None:
+            for relative_path in relative_paths:
+                full_path = base_dir / relative_path
+
+                if not extractor_registry.matches(full_path):
+                    continue
+
+                if ignore_matcher.ignores_file(full_path):
+                    continue
+
+                yield full_path
+            return
+
+        if file_enumeration == 'git':
+            raise UnknownFileEnumerationException(f'file_enumeration is "git", but {base_dir} is not a git checkout')
+
+    for root, dirs, files in walk_respecting_gitignore(settings.BASE_DIR, ignore_matcher=ignore_matcher):
+        for f in files:
             full_path = Path(root) / f
 
-            if ignore_filename(full_path, ignore_list=ignore_list):
+            if not extractor_registry.matches(full_path):
                 continue
 
-            with open(full_path) as file:
-                content = file.read()
+            if ignore_matcher.ignores_file(full_path):
+                continue
+
+            yield full_path
+
+
+def passes_prefilter(parse_function, content):
+    if get_conf('prefilter', '1') in ('0', 'false'):
+        return True
+    probe = prefilter_probe_by_parse_function.get(parse_function)
+    if probe is None:
+        return True
+    if not isinstance(content, str):
+        probe = bytes_regex(probe)
+    return probe.search(content) is not None
+
+
+generated_file_marker_regex = re.compile(rb'@generated|DO NOT EDIT|[Aa]uto-?generated|[Gg]enerated by')
+
+
+def guard_allows(full_path):
+    return compile_ignore_list(tuple(get_conf_list('guard_allow'))).ignores_file(full_path)
+
+
+def size_guard(full_path):
+    """
+    Returns why the file should be skipped without reading it, or None.
+    """
+    max_file_size = get_conf('max_file_size')
+    if not max_file_size or guard_allows(full_path):
+        return None
+
+    size = os.stat(full_path).st_size
+    if size > int(max_file_size):
+        return f'larger than max_file_size ({size} bytes)'
+    return None
+
 
-            yield from parse_function_by_extension[extension](content)
+def content_guard(full_path, data):
+    """
+    Returns why the file should be skipped as minified or generated, or None.
+    """
+    skip_minified = get_conf('skip_minified', '0') in ('1', 'true')
+    skip_generated = get_conf('skip_generated', '0') in ('1', 'true')
+    if not (skip_minified or skip_generated) or guard_allows(full_path):
+        return None
+
+    if skip_minified:
+        max_average_line_length = int(get_conf('max_average_line_length', '500'))
+        lines = count_newlines(data) + 1
+        if len(data) > max_average_line_length and len(data) / lines > max_average_line_length:
+            return f'minified (average line length {len(data) // lines})'
+
+    if skip_generated:
+        # Only look at the top of the file, that's where tools put their markers
+        m = generated_file_marker_regex.search(data, 0, 1024)
+        if m is not None:
+            return f'generated ("{m.group().decode()}" in the header)'
+
+    return None
+
+
+def parse_source(full_path, data):
+    """
+    Returns the list of strings found, and why the file was skipped: None if it wasn't, 'prefilter', or the reason
+    from the guards.
+    """
+    skip_reason = content_guard(full_path, data)
+    if skip_reason is not None:
+        return [], skip_reason
+
+    parse_function = get_extractor_registry().get(full_path)
+    # Memory mapped files are scanned as they are, see open_source
+    content = data if isinstance(data, mmap.mmap) else decode_source(data)
+    if not passes_prefilter(parse_function, content):
+        return [], 'prefilter'
+    return list(parse_function(content)), None
+
+
+def is_cacheable(skip_reason):
+    # Files skipped by the guards are checked every time, so they always show up in the summary
+    return skip_reason in (None, 'prefilter')
+
+
+# These extractors can scan bytes directly, so they get big files memory mapped instead of read and decoded
+bytes_parse_functions = {
+    parse_js,
+    parse_vue,
+    parse_elm,
+}
+
+
+def uses_mmap(full_path, size):
+    return size > int(get_conf('mmap_threshold', str(1 << 20))) and get_extractor_registry().get(full_path) in bytes_parse_functions
+
+
+@contextmanager
+def open_source(full_path):
+    """
+    The content of the file. Files larger than `mmap_threshold` bytes (default 1MB) are memory mapped if their
+    extractor can scan bytes, so memory use doesn't grow with the size of the file.
+    """
+    with open(full_path, 'rb') as file:
+        if uses_mmap(full_path, os.fstat(file.fileno()).st_size):
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+        else:
+            yield file.read()
+
+
+def read_source_ahead(full_path):
+    # Runs in a read ahead thread. Files that will be memory mapped are left for open_source.
+    with open(full_path, 'rb') as file:
+        if uses_mmap(full_path, os.fstat(file.fileno()).st_size):
+            return None
+        return file.read()
+
+
+def parse_file(full_path, data):
+    # This is the unit of work that is sent to worker processes. The content was already read to hash it, so it's sent
+    # along, except for memory mapped files: those are sent as None and mapped again by the worker.
+    if data is None:
+        with open_source(full_path) as data:
+            return parse_source(full_path, data)
+    return parse_source(full_path, data)
+
+
+def extract_file_without_reading(full_path, *, cache, stats):
+    """
+    Returns (strings, stat). The strings are None if the file has to be read, because it's not in the cache or
+    skipped by the guards.
+    """
+    strings = cache.get_unchanged(full_path)
+    if strings is not None:
+        stats.files_from_cache += 1
+        return strings, None
+
+    skip_reason = size_guard(full_path)
+    if skip_reason is not None:
+        stats.add_parsed(full_path, skip_reason=skip_reason)
+        return [], None
+
+    stat = os.stat(full_path)
+    strings = cache.get(full_path, stat=stat)
+    if strings is not None:
+        stats.files_from_cache += 1
+    return strings, stat
+
+
+def extract_content(full_path, data, *, stat, cache, stats):
+    digest = content_digest(data)
+    duplicate = cache.is_duplicate(full_path, digest)
+    strings = cache.get(full_path, stat=stat, digest=digest)
+    if strings is None:
+        start = time.perf_counter()
+        strings, skip_reason = parse_source(full_path, data)
+        stats.parse_seconds += time.perf_counter() - start
+        if is_cacheable(skip_reason):
+            cache.put(full_path, stat=stat, digest=digest, strings=strings)
+        stats.add_parsed(full_path, skip_reason=skip_reason)
+    elif duplicate:
+        stats.files_deduplicated += 1
+    else:
+        stats.files_from_cache += 1
+    return strings
+
+
+def extract_file(full_path, *, cache, stats):
+    strings, stat = extract_file_without_reading(full_path, cache=cache, stats=stats)
+    if strings is not None:
+        return strings
+
+    start = time.perf_counter()
+    with open_source(full_path) as data:
+        stats.read_wait_seconds += time.perf_counter() - start
+        return extract_content(full_path, data, stat=stat, cache=cache, stats=stats)
+
+
+def extract_files_read_ahead(paths, *, cache, stats, depth):
+    """
+    Like extracting the files one by one, but up to `depth` files that have to be read are read in threads ahead of
+    the file being parsed, so the CPU isn't idle while waiting for the disk or network file system.
+    """
+    # (full_path, strings, stat, future), in the order of paths
+    pending = deque()
+    reading = 0
+
+    def finish_first():
+        nonlocal reading
+        full_path, strings, stat, future = pending.popleft()
+        if future is None:
+            return full_path, strings
+
+        reading -= 1
+        start = time.perf_counter()
+        data = future.result()
+        stats.read_wait_seconds += time.perf_counter() - start
+        if data is None:
+            with open_source(full_path) as data:
+                return full_path, extract_content(full_path, data, stat=stat, cache=cache, stats=stats)
+        return full_path, extract_content(full_path, data, stat=stat, cache=cache, stats=stats)
+
+    executor = ThreadPoolExecutor(max_workers=int(get_conf('read_ahead_threads', '4')), thread_name_prefix='okrand-read-ahead')
+    try:
+        for full_path in paths:
+            strings, stat = extract_file_without_reading(full_path, cache=cache, stats=stats)
+            future = None
+            if strings is None:
+                future = executor.submit(read_source_ahead, full_path)
+                reading += 1
+            pending.append((full_path, strings, stat, future))
+            while pending and (pending[0][3] is None or reading > depth):
+                yield finish_first()
+
+        while pending:
+            yield finish_first()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _init_worker():
+    import django
+    if not registry_apps.ready:
+        django.setup()
+
+
+def parse_files(chunk):
+    # The unit of work that is sent to worker processes: a list of (full_path, data)
+    return [parse_file(full_path, data) for full_path, data in chunk]
+
+
+# Files are sent to the worker processes in chunks of this many
+PARALLEL_CHUNK_SIZE = 16
+
+
+@dataclass(kw_only=True)
+class _ParseJob:
+    # A unique content that is parsed by a worker, and the files that wait for it
+    full_path: Path
+    content_key: tuple
+    data: bytes = None
+    future: Future = None
+    index: int = 0
+    waiting: int = 1
+
+
+def extract_files_parallel(paths, *, cache, stats, jobs):
+    """
+    The main process reads and hashes the files that aren't cached, and sends them to the worker processes in chunks
+    as it goes, so reading and parsing overlap. At most a few chunks per worker are in flight, so only the content of
+    those is held in memory. Each unique content is only parsed once while it's in flight, and found in the cache
+    after that.
+    """
+    # (full_path, strings, stat, job), in the order of paths. Files without a job are done.
+    pending = deque()
+    jobs_by_content_key = {}
+    chunk = []
+    waiting = 0
+    max_waiting = jobs * 4 * PARALLEL_CHUNK_SIZE
+
+    def submit_chunk():
+        future = executor.submit(parse_files, [(job.full_path, job.data) for job in chunk])
+        for index, job in enumerate(chunk):
+            job.future = future
+            job.index = index
+            job.data = None
+        chunk.clear()
+
+    def finish_first():
+        nonlocal waiting
+        full_path, strings, stat, job = pending.popleft()
+        if job is None:
+            return full_path, strings
+
+        waiting -= 1
+        if job.future is None:
+            submit_chunk()
+        strings, skip_reason = job.future.result()[job.index]
+        job.waiting -= 1
+        if job.waiting == 0:
+            del jobs_by_content_key[job.content_key]
+
+        if not is_cacheable(skip_reason):
+            # Skipped by the guards, which aren't cached
+            stats.add_parsed(full_path, skip_reason=skip_reason)
+        else:
+            if job.full_path == full_path:
+                stats.add_parsed(full_path, skip_reason=skip_reason)
+            else:
+                stats.files_deduplicated += 1
+            cache.put(full_path, stat=stat, digest=job.content_key[1], strings=strings)
+        return full_path, strings
+
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker)
+    try:
+        for full_path in paths:
+            strings, stat = extract_file_without_reading(full_path, cache=cache, stats=stats)
+            job = None
+            if strings is None:
+                with open_source(full_path) as data:
+                    digest = content_digest(data)
+                    # Memory mapped files are mapped again by the worker, sending them would copy them
+                    if isinstance(data, mmap.mmap):
+                        data = None
+                duplicate = cache.is_duplicate(full_path, digest)
+                strings = cache.get(full_path, stat=stat, digest=digest)
+                if strings is None:
+                    content_key = cache.content_key(full_path, digest)
+                    job = jobs_by_content_key.get(content_key)
+                    if job is None:
+                        job = jobs_by_content_key[content_key] = _ParseJob(full_path=full_path, content_key=content_key, data=data)
+                        chunk.append(job)
+                        if len(chunk) == PARALLEL_CHUNK_SIZE:
+                            submit_chunk()
+                    else:
+                        job.waiting += 1
+                    waiting += 1
+                elif duplicate:
+                    stats.files_deduplicated += 1
+                else:
+                    stats.files_from_cache += 1
+            pending.append((full_path, strings, stat, job))
+            while pending and (pending[0][3] is None or waiting > max_waiting):
+                yield finish_first()
+
+        while pending:
+            yield finish_first()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def extract_files(paths, *, cache, stats, jobs=1):
+    if jobs > 1:
+        yield from extract_files_parallel(paths, cache=cache, stats=stats, jobs=jobs)
+        return
+
+    depth = int(get_conf('read_ahead', '16'))
+    if depth > 0:
+        yield from extract_files_read_ahead(paths, cache=cache, stats=stats, depth=depth)
+        return
+
+    for full_path in paths:
+        yield full_path, extract_file(full_path, cache=cache, stats=stats)
+
+
+def get_jobs(jobs=None):
+    if jobs is None:
+        jobs = int(get_conf('jobs', '1'))
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+def model_registry_fingerprint(models):
+    """
+    Changes when a model, its fields, or the source of the modules it and its base classes are defined in change.
+    """
+    fingerprint = hashlib.sha1(repr((CACHE_FORMAT_VERSION, __version__, sorted(config.items()))).encode())
+    module_names = {}
+    for model in models:
+        model_fields = [
+            (f.name, type(f).__module__, type(f).__qualname__)
+            for f in [*model._meta.local_fields, *model._meta.local_many_to_many]
+        ]
+        fingerprint.update(repr((model._meta.label, model_fields)).encode())
+        module_names.update({cls.__module__: None for cls in model.__mro__})
+
+    for module_name in module_names:
+        filename = getattr(sys.modules.get(module_name), '__file__', None)
+        if filename is None:
+            continue
+        with open(filename, 'rb') as f:
+            fingerprint.update(f'{module_name}:{content_digest(f.read())}'.encode())
+
+    return fingerprint.hexdigest()
+
+
+def find_model_strings(*, stats):
+    """
+    The strings from `translations_for_all_models`. With `cache_dir` configured they are cached, and the models are
+    only walked again when the fingerprint of the app registry changes.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return list(translations_for_all_models())
+
+    models = models_to_process()
+    fingerprint = model_registry_fingerprint(models)
+    path = cache_dir / 'models.pickle'
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        data = None
+
+    if isinstance(data, dict) and data.get('fingerprint') == fingerprint:
+        stats.models_from_cache = True
+        return data['strings']
+
+    strings = [s for model in models for s in translations_for_model(model)]
+    write_pickle(path, dict(fingerprint=fingerprint, strings=strings))
+    stats.models_from_cache = False
+    return strings
+
+
+def files_digest(paths):
+    """
+    A digest of the names and content of the files. Useful as the `cache_key` of a plugin that reads files.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(str(x) for x in paths):
+        with open(path, 'rb') as f:
+            digest.update(f'{path}:{content_digest(f.read())}\n'.encode())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True, kw_only=True)
+class _PluginResult:
+    strings: list
+    seconds: float
+    from_cache: bool
+    cache_key: object = None
+
+
+class PluginRunner:
+    """
+    Runs the `find_source_strings_plugins` in threads, so they run at the same time as each other and the extraction
+    from source files.
+
+    A plugin can have a `cache_key` attribute: a function that takes the same arguments as the plugin and returns a
+    value that changes when the inputs of the plugin change, like `files_digest(paths)`. With `cache_dir` configured
+    the strings of the plugin are reused for as long as the key stays the same.
+    """
+
+    def __init__(self, ignore_list):
+        self.ignore_list = ignore_list
+        self.names = get_conf_list('find_source_strings_plugins')
+        # Imported here, so a misconfigured plugin fails right away
+        self.functions = [import_extractor(name) for name in self.names]
+        cache_dir = get_cache_dir()
+        self.cache_path = cache_dir / 'plugins.pickle' if cache_dir is not None else None
+        self.cached = self.load_cache()
+        self.futures = []
+        if self.names:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.names), thread_name_prefix='okrand-plugin')
+            self.futures = [self.executor.submit(self.run, name, function) for name, function in zip(self.names, self.functions)]
+            self.executor.shutdown(wait=False)
+
+    def load_cache(self):
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def run(self, name, function):
+        start = time.perf_counter()
+        cache_key = None
+        if self.cache_path is not None and hasattr(function, 'cache_key'):
+            cache_key = (CACHE_FORMAT_VERSION, __version__, function.cache_key(ignore_list=self.ignore_list))
+            cached = self.cached.get(name)
+            if cached is not None and cached[0] == cache_key:
+                return _PluginResult(strings=cached[1], seconds=time.perf_counter() - start, from_cache=True, cache_key=cache_key)
+
+        strings = list(function(ignore_list=self.ignore_list))
+        return _PluginResult(strings=strings, seconds=time.perf_counter() - start, from_cache=False, cache_key=cache_key)
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def strings(self, *, stats):
+        """
+        Waits for all plugins, and returns their strings in the order the plugins are configured.
+        """
+        result = []
+        cached = {}
+        for name, future in zip(self.names, self.futures):
+            plugin_result = future.result()
+            stats.plugin_seconds[name] = plugin_result.seconds
+            if plugin_result.from_cache:
+                stats.plugins_from_cache.add(name)
+            if plugin_result.cache_key is not None:
+                cached[name] = (plugin_result.cache_key, plugin_result.strings)
+            result.extend(plugin_result.strings)
+
+        if cached != self.cached and self.cache_path is not None:
+            write_pickle(self.cache_path, cached)
+        return result
+
+
+def find_model_and_plugin_strings(ignore_list, *, stats=None, plugins=None):
+    if stats is None:
+        stats = ExtractionStats()
+    if plugins is None:
+        plugins = PluginRunner(ignore_list)
+
+    if get_conf('django_model_upgrade', '0') in ('1', 'true'):
+        yield from find_model_strings(stats=stats)
+
+    yield from plugins.strings(stats=stats)
+
+
+def find_source_strings_by_path(ignore_list, *, stats=None, jobs=1, since=None):
+    """
+    Yields (full_path, strings) for each source file. Strings from models and plugins come first, with the path None.
+
+    With `since` set to a git ref, only the files changed since then are checked. The cached results are used
+    for all other files, if the cache was built at that commit.
+    """
+    if stats is None:
+        stats = ExtractionStats()
+
+    plugins = PluginRunner(ignore_list)
+
+    cache = load_extraction_cache()
+    if since is not None:
+        cache.use_git_changes(settings.BASE_DIR, since)
+    cache.record_checkout(settings.BASE_DIR)
+
+    files = extract_files(find_source_files(ignore_list), cache=cache, stats=stats, jobs=jobs)
+
+    # The plugins run while the source files are extracted. Their strings come first, so the output doesn't depend on
+    # which finishes first. Files extracted before the plugins are done are held back until then.
+    held_back = []
+    if not plugins.done():
+        for result in files:
+            held_back.append(result)
+            if plugins.done():
+                break
+
+    yield None, find_model_and_plugin_strings(ignore_list, stats=stats, plugins=plugins)
+    yield from held_back
+    yield from files
+
+    cache.save()
+
+
+def find_source_strings(ignore_list, *, stats=None, jobs=1, since=None):
+    for full_path, strings in find_source_strings_by_path(ignore_list, stats=stats, jobs=jobs, since=since):
+        yield from strings
+
+
+def relative_source_path(full_path):
+    # This is what ends up in the occurrences in the .po files, so it should be the same on all machines
+    try:
+        return Path(full_path).relative_to(settings.BASE_DIR).as_posix()
+    except ValueError:
+        return str(full_path)
 
 
 POEntry.__repr__ = lambda self: f'<POEntry: {self.msgid}{" (obsolete)" if self.obsolete else ""}>'
@@ -510,25 +2503,38 @@ class UpdateResult:
     newly_obsolete_strings: List[str] = field(default_factory=list)
     previously_obsolete_strings: List[str] = field(default_factory=list)
     domain: str = field(default='django')
+    stats: ExtractionStats = field(default=None, compare=False)
 
 
 class UnknownSortException(OkrandException):
     pass
 
 
-def update_po_files(*, old_msgid_by_new_msgid=None, sort=None, languages=None) -> UpdateResult:
+def update_po_files(*, old_msgid_by_new_msgid=None, sort=None, languages=None, jobs=None, strings=None, only_domains=None, since=None) -> UpdateResult:
+    """
+    Pass `strings` to use already extracted strings instead of scanning the project, and `only_domains` to only
+    write the .po files of those domains.
+    """
     if sort is None:
         sort = config.get('sort', 'none').strip()
 
     if sort not in ('none', 'alphabetical'):
         raise UnknownSortException(f'Unknown sort configuration "{sort}"')
 
-    ignore_list = get_conf_list('ignore')
+    stats = ExtractionStats()
+    if strings is None:
+        ignore_list = get_conf_list('ignore')
+        strings = UniqueStrings(track_sources=get_conf('occurrences', '0') in ('1', 'true'))
+        for full_path, file_strings in find_source_strings_by_path(ignore_list=ignore_list, stats=stats, jobs=get_jobs(jobs), since=since):
+            strings.add(file_strings, path=relative_source_path(full_path) if full_path is not None else None)
 
-    strings = list(find_source_strings(ignore_list=ignore_list))
+    if not isinstance(strings, UniqueStrings):
+        strings = UniqueStrings(strings)
+    # Built once, and shared by all the languages
+    index = StringIndex.build(strings, with_occurrences=get_conf('occurrences', '0') in ('1', 'true'))
 
     # noinspection PyTypeChecker
-    result_fields = fields(UpdateResult)
+    result_fields = [f for f in fields(UpdateResult) if f.name != 'stats']
 
     # dicts as a poor man's ordered set
     result_totals = {
@@ -540,7 +2546,7 @@ def update_po_files(*, old_msgid_by_new_msgid=None, sort=None, languages=None) -
         languages = [k for k, v in settings.LANGUAGES]
 
     for language_code in languages:
-        for r in update_language(language_code=language_code, strings=strings, sort=sort, old_msgid_by_new_msgid=old_msgid_by_new_msgid):
+        for r in update_language(language_code=language_code, strings=index, sort=sort, old_msgid_by_new_msgid=old_msgid_by_new_msgid, only_domains=only_domains):
             for f in result_fields:
                 result_totals[f.name].update({x: None for x in getattr(r, f.name)})
 
@@ -548,7 +2554,8 @@ def update_po_files(*, old_msgid_by_new_msgid=None, sort=None, languages=None) -
         **{
             k: list(v)
             for k, v in result_totals.items()
-        }
+        },
+        stats=stats,
     )
 
 
@@ -562,8 +2569,13 @@ def get_or_create_pofile(*, language_code, domain):
         return po, True
 
 
-def update_language(*, language_code, strings, sort='none', old_msgid_by_new_msgid=None):
-    for domain in domains:
+def update_language(*, language_code, strings, sort='none', old_msgid_by_new_msgid=None, only_domains=None):
+    strings = StringIndex.build(strings)
+    # Sorted, so the results come in the same order every time
+    for domain in sorted(domains):
+        if only_domains is not None and domain not in only_domains:
+            continue
+
         po_file, _ = get_or_create_pofile(language_code=language_code, domain=domain)
 
         result = _update_language(po_file=po_file, strings=strings, old_msgid_by_new_msgid=old_msgid_by_new_msgid, domain=domain)
@@ -578,6 +2590,176 @@ def update_language(*, language_code, strings, sort='none', old_msgid_by_new_msg
         yield result
 
 
+class WatchState:
+    """
+    The strings of the project kept in memory, per source file, so a change only needs the changed files parsed again.
+    """
+
+    def __init__(self, *, ignore_list, jobs=1):
+        self.ignore_matcher = compile_ignore_list(tuple(ignore_list))
+        self.gitignored = Cache()
+        self.stats = ExtractionStats()
+        self.cache = load_extraction_cache()
+        self.strings = UniqueStrings(find_model_and_plugin_strings(ignore_list, stats=self.stats), track_sources=True)
+        self.paths = set()
+        for full_path, strings in extract_files(find_source_files(ignore_list), cache=self.cache, stats=self.stats, jobs=jobs):
+            self.strings.add(strings, path=relative_source_path(full_path))
+            self.paths.add(full_path)
+
+    def is_source_file(self, full_path):
+        if full_path in self.paths:
+            return True
+
+        if not get_extractor_registry().matches(full_path) or '.git' in full_path.parts:
+            return False
+
+        return not self.ignore_matcher.ignores_file(full_path) and not self.gitignored(str(full_path), is_dir=False)
+
+    def update(self, changed_paths):
+        """
+        Parse the changed files again. Returns the domains whose strings changed.
+        """
+        # Moving a string to another line only matters if we write the occurrences
+        compare_lines = get_conf('occurrences', '0') in ('1', 'true')
+        changed_domains = set()
+        for full_path in changed_paths:
+            full_path = Path(full_path)
+            if not self.is_source_file(full_path):
+                continue
+
+            try:
+                strings = extract_file(full_path, cache=self.cache, stats=self.stats)
+            except FileNotFoundError:
+                self.paths.discard(full_path)
+                strings = []
+            else:
+                self.paths.add(full_path)
+
+            changed_domains |= self.strings.replace(relative_source_path(full_path), strings, compare_lines=compare_lines)
+
+        return changed_domains
+
+    def save(self):
+        self.cache.save()
+
+
+class SourcePoller:
+    """
+    Stat based change detection, for when watchfiles isn't installed. Only source files and the directories
+    we walked are checked. Directories are listed again when their mtime changes, to find new files.
+    """
+
+    def __init__(self, path, *, ignore_matcher):
+        self.ignore_matcher = ignore_matcher
+        self.mtime_by_path = {}
+        self.directories = set()
+        self._scan(path)
+
+    def _scan(self, path):
+        extractor_registry = get_extractor_registry()
+        found = []
+        for root, dirs, files in walk_respecting_gitignore(path, ignore_matcher=self.ignore_matcher):
+            root = Path(root)
+            dirs[:] = [x for x in dirs if root / x not in self.directories]
+            self.directories.add(root)
+            self.mtime_by_path[root] = os.stat(root).st_mtime_ns
+            for f in files:
+                full_path = root / f
+                if extractor_registry.matches(full_path) and full_path not in self.mtime_by_path:
+                    self.mtime_by_path[full_path] = os.stat(full_path).st_mtime_ns
+                    found.append(full_path)
+        return found
+
+    def poll(self):
+        changed = set()
+        for full_path, mtime_ns in list(self.mtime_by_path.items()):
+            try:
+                new_mtime_ns = os.stat(full_path).st_mtime_ns
+            except FileNotFoundError:
+                del self.mtime_by_path[full_path]
+                if full_path in self.directories:
+                    self.directories.remove(full_path)
+                else:
+                    changed.add(full_path)
+                continue
+
+            if new_mtime_ns == mtime_ns:
+                continue
+
+            if full_path in self.directories:
+                # Only new files and directories are picked up here, known ones are checked by this loop
+                changed.update(self._scan(full_path))
+            else:
+                self.mtime_by_path[full_path] = new_mtime_ns
+                changed.add(full_path)
+
+        return changed
+
+
+def watch_changes(path, *, ignore_matcher):
+    """
+    Yields sets of changed paths. Bursts of changes are collected until nothing has changed for `watch_debounce`
+    seconds. Uses watchfiles (inotify and friends) if it's installed, and polls otherwise.
+    """
+    debounce = float(get_conf('watch_debounce', '0.3'))
+    poll_interval = float(get_conf('watch_poll_interval', '0.5'))
+
+    try:
+        import watchfiles
+    except ImportError:
+        watchfiles = None
+
+    if watchfiles is not None and get_conf('watch_polling', '0') not in ('1', 'true'):
+        for changes in watchfiles.watch(
+            path,
+            debounce=int(debounce * 1000),
+            watch_filter=lambda change, p: get_extractor_registry().matches(p),
+        ):
+            yield {Path(p) for change, p in changes}
+        return
+
+    poller = SourcePoller(path, ignore_matcher=ignore_matcher)
+    pending = set()
+    last_change = None
+    while True:
+        time.sleep(poll_interval)
+        changed = poller.poll()
+        now = time.monotonic()
+        if changed:
+            pending |= changed
+            last_change = now
+        elif pending and now - last_change >= debounce:
+            yield pending
+            pending = set()
+
+
+def watch_po_files(*, sort=None, languages=None, jobs=None, changes=None):
+    """
+    Yields the result of a full update, and then the result of an update after each batch of changes.
+    Only the .po files of the domains that got changed strings are written.
+
+    Strings from models and plugins are only collected at the start.
+    """
+    ignore_list = get_conf_list('ignore')
+    state = WatchState(ignore_list=ignore_list, jobs=get_jobs(jobs))
+    try:
+        yield replace(
+            update_po_files(sort=sort, languages=languages, strings=state.strings),
+            stats=state.stats,
+        )
+
+        if changes is None:
+            changes = watch_changes(settings.BASE_DIR, ignore_matcher=state.ignore_matcher)
+
+        for changed_paths in changes:
+            changed_domains = state.update(changed_paths)
+            if not changed_domains:
+                continue
+            yield update_po_files(sort=sort, languages=languages, strings=state.strings, only_domains=changed_domains)
+    finally:
+        state.save()
+
+
 def normalize(msgid):
     if msgid:
         return msgid.replace('\r\n', '\n')
@@ -593,11 +2775,8 @@ def _update_language(*, po_file, strings, old_msgid_by_new_msgid=None, domain) -
             po_entry.msgid_plural = normalize(po_entry.msgid_plural)
 
     # Singular
-    string_by_msgid = {
-        s.msgid: s
-        for s in strings
-        if s.domain == domain
-    }
+    strings = StringIndex.build(strings, with_occurrences=get_conf('occurrences', '0') in ('1', 'true'))
+    string_by_msgid = strings.string_by_msgid(domain)
 
     po_entry_by_msgid = {
         x.msgid: x
@@ -704,6 +2883,11 @@ def _update_language(*, po_file, strings, old_msgid_by_new_msgid=None, domain) -
     else:
         newly_obsolete_strings = [x.msgid for x in newly_obsolete_po_entries]
 
+    if strings.occurrences_by_key is not None:
+        for po_entry in po_file:
+            if not po_entry.obsolete and po_entry.msgid in string_by_msgid:
+                po_entry.occurrences = list(strings.occurrences(domain, po_entry.msgid))
+
     newly_obsolete_strings_set = set(newly_obsolete_strings)
     previously_obsolete_strings = [x.msgid for x in obsolete_po_entries if x.msgid not in newly_obsolete_strings_set]
 
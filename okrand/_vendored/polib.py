@@ -68,14 +68,24 @@ def _pofile_or_mofile(f, type, **kwargs):
         enc = detect_encoding(f, type == 'mofile')
 
     # parse the file
-    kls = type == 'pofile' and _POFileParser or _MOFileParser
-    parser = kls(
-        f,
-        encoding=enc,
-        check_for_duplicates=kwargs.get('check_for_duplicates', False),
-        klass=kwargs.get('klass')
-    )
-    instance = parser.parse()
+    if type == 'pofile':
+        # try the bulk parser first, the state machine handles
+        # anything it doesn't
+        kls_list = [_BulkPOFileParser, _POFileParser]
+    else:
+        kls_list = [_MOFileParser]
+    for kls in kls_list:
+        parser = kls(
+            f,
+            encoding=enc,
+            check_for_duplicates=kwargs.get('check_for_duplicates', False),
+            klass=kwargs.get('klass')
+        )
+        try:
+            instance = parser.parse()
+        except _UnusualPOFile:
+            continue
+        break
     instance.wrapwidth = kwargs.get('wrapwidth', 78)
     return instance
 # }}}
@@ -294,6 +304,17 @@ class _BaseFile(list):
     classes. This class should **not** be instantiated directly.
     """
 
+    # The entries by msgid, or by (msgctxt, msgid) for entries with a
+    # msgctxt: the entry, or a list of them if there are several. And the
+    # msgctxts used with each msgid, for lookups without a msgctxt. Built on
+    # the first lookup, and kept up to date when entries are added, removed,
+    # or change their msgid or msgctxt. Reordering the list doesn't change
+    # it: find() puts matches in file order when there are several.
+    # Class attributes, because list items are added before the instance
+    # dict is restored when unpickling.
+    _index = None
+    _msgctxts_by_msgid = None
+
     def __init__(self, *args, **kwargs):
         """
         Constructor, accepts the following keyword arguments:
@@ -375,6 +396,154 @@ class _BaseFile(list):
     def __eq__(self, other):
         return str(self) == str(other)
 
+    def __getstate__(self):
+        # The entries are pickled as the list items, the index is rebuilt
+        state = self.__dict__.copy()
+        state.pop('_index', None)
+        state.pop('_msgctxts_by_msgid', None)
+        return state
+
+    def _find_by_msgid(self, msgid, msgctxt=False):
+        """
+        The entries with ``msgid``, and ``msgctxt`` unless that is False, in
+        file order.
+        """
+        if self._index is None:
+            self._index = {}
+            self._msgctxts_by_msgid = {}
+            for entry in self:
+                self._add_to_index(entry)
+        if msgctxt is False:
+            keys = [msgid] + [
+                (c, msgid) for c in self._msgctxts_by_msgid.get(msgid, ())
+            ]
+        else:
+            keys = [msgid if msgctxt is None else (msgctxt, msgid)]
+        matches = []
+        for key in keys:
+            entries = self._index.get(key)
+            if isinstance(entries, list):
+                matches.extend(entries)
+            elif entries is not None:
+                matches.append(entries)
+        if len(matches) > 1:
+            position = dict((id(e), i) for i, e in enumerate(self))
+            matches.sort(key=lambda e: position[id(e)])
+        return matches
+
+    def _add_to_index(self, entry):
+        if self._index is None:
+            return
+        msgid, msgctxt = entry.msgid, entry.msgctxt
+        key = msgid if msgctxt is None else (msgctxt, msgid)
+        entries = self._index.get(key)
+        if entries is None:
+            self._index[key] = entry
+            if msgctxt is not None:
+                self._msgctxts_by_msgid.setdefault(msgid, []).append(msgctxt)
+        elif isinstance(entries, list):
+            entries.append(entry)
+        else:
+            self._index[key] = [entries, entry]
+        entry._add_owner(self)
+
+    def _remove_from_index(self, entry, msgctxt, msgid):
+        """
+        Removes ``entry`` from the index, where it is under ``msgctxt`` and
+        ``msgid``. Returns whether it was there.
+        """
+        key = msgid if msgctxt is None else (msgctxt, msgid)
+        entries = self._index.get(key)
+        if isinstance(entries, list):
+            for i, e in enumerate(entries):
+                if e is entry:
+                    del entries[i]
+                    if len(entries) == 1:
+                        self._index[key] = entries[0]
+                    return True
+            return False
+        if entries is not entry:
+            return False
+        del self._index[key]
+        if msgctxt is not None:
+            msgctxts = self._msgctxts_by_msgid[msgid]
+            msgctxts.remove(msgctxt)
+            if not msgctxts:
+                del self._msgctxts_by_msgid[msgid]
+        return True
+
+    def _removed(self, entries):
+        if self._index is None:
+            return
+        for entry in entries:
+            self._remove_from_index(entry, entry.msgctxt, entry.msgid)
+
+    def _entry_key_changed(self, entry, old_msgctxt, old_msgid):
+        """
+        Called by the entries in the index when their msgid or msgctxt
+        changes.
+        """
+        if self._index is None:
+            return
+        # The same entry can be in the file more than once
+        count = 0
+        while self._remove_from_index(entry, old_msgctxt, old_msgid):
+            count += 1
+        for _ in range(count):
+            self._add_to_index(entry)
+
+    def _drop_index(self):
+        self._index = None
+        self._msgctxts_by_msgid = None
+
+    def remove(self, entry):
+        # Like list.remove, which compares with ==, so that can be another
+        # entry with the same content
+        index = self.index(entry)
+        removed = self[index]
+        super(_BaseFile, self).__delitem__(index)
+        self._removed((removed,))
+
+    def pop(self, *args):
+        removed = super(_BaseFile, self).pop(*args)
+        self._removed((removed,))
+        return removed
+
+    def clear(self):
+        super(_BaseFile, self).clear()
+        self._drop_index()
+
+    def extend(self, entries):
+        entries = list(entries)
+        super(_BaseFile, self).extend(entries)
+        for entry in entries:
+            self._add_to_index(entry)
+
+    def __iadd__(self, entries):
+        self.extend(entries)
+        return self
+
+    def __imul__(self, n):
+        self._drop_index()
+        return super(_BaseFile, self).__imul__(n)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            removed = self[index]
+            added = value = list(value)
+        else:
+            removed = (self[index],)
+            added = (value,)
+        super(_BaseFile, self).__setitem__(index, value)
+        self._removed(removed)
+        for entry in added:
+            self._add_to_index(entry)
+
+    def __delitem__(self, index):
+        removed = self[index]
+        super(_BaseFile, self).__delitem__(index)
+        self._removed(removed if isinstance(index, slice) else (removed,))
+
     def append(self, entry):
         """
         Overridden method to check for duplicates entries, if a user tries to
@@ -391,6 +560,7 @@ class _BaseFile(list):
         if getattr(self, 'check_for_duplicates', False) and entry in self:
             raise ValueError('Entry "%s" already exists' % entry.msgid)
         super(_BaseFile, self).append(entry)
+        self._add_to_index(entry)
 
     def insert(self, index, entry):
         """
@@ -409,6 +579,7 @@ class _BaseFile(list):
         if self.check_for_duplicates and entry in self:
             raise ValueError('Entry "%s" already exists' % entry.msgid)
         super(_BaseFile, self).insert(index, entry)
+        self._add_to_index(entry)
 
     def metadata_as_entry(self):
         """
@@ -487,16 +658,23 @@ class _BaseFile(list):
             string, allows specifying a specific message context for the
             search.
         """
-        if include_obsolete_entries:
-            entries = self[:]
+        if by == 'msgid':
+            # Only the entries with the right msgid, instead of all of them
+            entries = self._find_by_msgid(st, msgctxt)
         else:
-            entries = [e for e in self if not e.obsolete]
+            entries = self
+        if not include_obsolete_entries:
+            entries = [e for e in entries if not e.obsolete]
         matches = []
         for e in entries:
             if getattr(e, by) == st:
                 if msgctxt is not False and e.msgctxt != msgctxt:
                     continue
                 matches.append(e)
+        return self._best_match(matches, msgctxt)
+
+    @staticmethod
+    def _best_match(matches, msgctxt):
         if len(matches) == 1:
             return matches[0]
         elif len(matches) > 1:
@@ -822,12 +1000,112 @@ class MOFile(_BaseFile):
 # class _BaseEntry {{{
 
 
+def _storing(method):
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._store()
+        return result
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class _LazyList(list):
+    """
+    The empty list returned for a lazy list attribute that isn't set. It is
+    only stored on its entry when something is added to it, so reading the
+    attribute doesn't make the entry any bigger.
+    """
+
+    __slots__ = ('_owner', '_slot')
+
+    def __init__(self, owner, slot):
+        self._owner = owner
+        self._slot = slot
+
+    def _store(self):
+        if self._owner is not None:
+            # Unless the attribute was set since this was returned
+            if getattr(self._owner, self._slot) is None:
+                setattr(self._owner, self._slot, self)
+            self._owner = None
+
+    def __reduce__(self):
+        # Copies and pickles are plain lists
+        return list, (list(self),)
+
+    append = _storing(list.append)
+    extend = _storing(list.extend)
+    insert = _storing(list.insert)
+    __setitem__ = _storing(list.__setitem__)
+    __iadd__ = _storing(list.__iadd__)
+
+
+class _LazyDict(dict):
+    """
+    Like :class:`_LazyList`, for a lazy dict attribute.
+    """
+
+    __slots__ = ('_owner', '_slot')
+
+    def __init__(self, owner, slot):
+        self._owner = owner
+        self._slot = slot
+
+    _store = _LazyList._store
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    update = _storing(dict.update)
+    setdefault = _storing(dict.setdefault)
+    __setitem__ = _storing(dict.__setitem__)
+    __ior__ = _storing(dict.__ior__)
+
+
+def _lazy_container(name, factory):
+    """
+    A property for a list or dict attribute that is usually empty. Nothing is
+    stored until something is added to it, so an entry that never uses it
+    doesn't pay for an empty container. ``factory`` is :class:`_LazyList` or
+    :class:`_LazyDict`.
+    """
+    slot = '_' + name
+
+    def getter(self):
+        value = getattr(self, slot)
+        if value is None:
+            return factory(self, slot)
+        return value
+
+    def setter(self, value):
+        if isinstance(value, factory) and value._owner is not None:
+            # The unset attribute of another entry, so unset here too
+            value = None
+        setattr(self, slot, value)
+
+    return property(getter, setter)
+
+
 class _BaseEntry(object):
     """
     Base class for :class:`~polib.POEntry` and :class:`~polib.MOEntry` classes.
     This class should **not** be instantiated directly.
     """
 
+    # Catalogs can have a lot of entries, so they don't get an instance dict.
+    # _owners are the files whose index this entry is in: None, a file, or a
+    # tuple of them. See _BaseFile._index
+    __slots__ = (
+        '_msgid',
+        'msgstr',
+        'msgid_plural',
+        '_msgstr_plural',
+        '_msgctxt',
+        'obsolete',
+        'encoding',
+        '_owners',
+    )
+
     def __init__(
             self,
             *,
@@ -864,12 +1142,13 @@ class _BaseEntry(object):
             string, the encoding to use, defaults to ``default_encoding``
             global variable (optional).
         """
-        self.msgid = msgid
+        self._owners = None
+        self._msgid = msgid
         self.msgstr = msgstr
         self.msgid_plural = msgid_plural
-        self.msgstr_plural = msgstr_plural or {}
-        assert isinstance(self.msgstr_plural, dict)
-        self.msgctxt = msgctxt
+        assert msgstr_plural is None or isinstance(msgstr_plural, dict)
+        self._msgstr_plural = msgstr_plural or None
+        self._msgctxt = msgctxt
         self.obsolete = obsolete
         self.encoding = encoding or default_encoding
 
@@ -892,9 +1171,9 @@ class _BaseEntry(object):
         if self.msgid_plural:
             ret += self._str_field("msgid_plural", delflag, "",
                                    self.msgid_plural, wrapwidth)
-        if self.msgstr_plural:
+        if self._msgstr_plural:
             # write the msgstr_plural if any
-            msgstrs = self.msgstr_plural
+            msgstrs = self._msgstr_plural
             keys = list(msgstrs)
             keys.sort()
             for index in keys:
@@ -923,6 +1202,61 @@ class _BaseEntry(object):
     def __eq__(self, other):
         return str(self) == str(other)
 
+    msgstr_plural = _lazy_container('msgstr_plural', _LazyDict)
+
+    @property
+    def msgid(self):
+        return self._msgid
+
+    @msgid.setter
+    def msgid(self, value):
+        old_msgid = self._msgid
+        self._msgid = value
+        if value != old_msgid and self._owners is not None:
+            self._key_changed(self._msgctxt, old_msgid)
+
+    @property
+    def msgctxt(self):
+        return self._msgctxt
+
+    @msgctxt.setter
+    def msgctxt(self, value):
+        old_msgctxt = self._msgctxt
+        self._msgctxt = value
+        if value != old_msgctxt and self._owners is not None:
+            self._key_changed(old_msgctxt, self._msgid)
+
+    def _key_changed(self, old_msgctxt, old_msgid):
+        # The files index the entries by msgctxt and msgid
+        owners = self._owners
+        for owner in owners if isinstance(owners, tuple) else (owners,):
+            owner._entry_key_changed(self, old_msgctxt, old_msgid)
+
+    def _add_owner(self, owner):
+        # Almost always a single file, which is stored as is
+        owners = self._owners
+        if owners is None:
+            self._owners = owner
+        elif isinstance(owners, tuple):
+            if not any(x is owner for x in owners):
+                self._owners = owners + (owner,)
+        elif owners is not owner:
+            self._owners = (owners, owner)
+
+    def __getstate__(self):
+        # The files are pickled on their own, and rebuild their index
+        return {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, '__slots__', ())
+            if name != '_owners'
+        }
+
+    def __setstate__(self, state):
+        self._owners = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def _str_field(self, fieldname, delflag, plural_index, field,
                    wrapwidth=78):
         lines = field.splitlines(True)
@@ -973,6 +1307,20 @@ class POEntry(_BaseEntry):
     Represents a po file entry.
     """
 
+    __slots__ = (
+        'comment',
+        'tcomment',
+        '_occurrences',
+        '_flags',
+        'previous_msgctxt',
+        'previous_msgid',
+        'previous_msgid_plural',
+        'linenum',
+    )
+
+    occurrences = _lazy_container('occurrences', _LazyList)
+    flags = _lazy_container('flags', _LazyList)
+
     def __init__(
         self,
         *,
@@ -1030,8 +1378,8 @@ class POEntry(_BaseEntry):
         )
         self.comment = comment
         self.tcomment = tcomment
-        self.occurrences = occurrences or []
-        self.flags = flags or []
+        self._occurrences = occurrences or None
+        self._flags = flags or None
         self.previous_msgctxt = previous_msgctxt
         self.previous_msgid = previous_msgid
         self.previous_msgid_plural = previous_msgid_plural
@@ -1063,7 +1411,7 @@ class POEntry(_BaseEntry):
                         ret.append('%s%s' % (c[1], comment))
 
         # occurrences (with text wrapping as xgettext does)
-        if not self.obsolete and self.occurrences:
+        if not self.obsolete and self._occurrences:
             filelist = []
             for fpath, lineno in self.occurrences:
                 if lineno:
@@ -1087,8 +1435,8 @@ class POEntry(_BaseEntry):
                 ret.append('#: ' + filestr)
 
         # flags (TODO: wrapping ?)
-        if self.flags:
-            ret.append('#, %s' % ', '.join(self.flags))
+        if self._flags:
+            ret.append('#, %s' % ', '.join(self._flags))
 
         # previous context and previous msgid/msgid_plural
         fields = ['previous_msgctxt', 'previous_msgid',
@@ -1117,8 +1465,8 @@ class POEntry(_BaseEntry):
             else:
                 return 1
         # Work on a copy to protect original
-        occ1 = sorted(self.occurrences[:])
-        occ2 = sorted(other.occurrences[:])
+        occ1 = sorted(self._occurrences or [])
+        occ2 = sorted(other._occurrences or [])
         if occ1 > occ2:
             return 1
         if occ1 < occ2:
@@ -1138,12 +1486,12 @@ class POEntry(_BaseEntry):
         elif msgid_plural < othermsgid_plural:
             return -1
         # Compare msgstr_plural
-        if self.msgstr_plural and isinstance(self.msgstr_plural, dict):
-            msgstr_plural = list(self.msgstr_plural.values())
+        if self._msgstr_plural and isinstance(self._msgstr_plural, dict):
+            msgstr_plural = list(self._msgstr_plural.values())
         else:
             msgstr_plural = []
-        if other.msgstr_plural and isinstance(other.msgstr_plural, dict):
-            othermsgstr_plural = list(other.msgstr_plural.values())
+        if other._msgstr_plural and isinstance(other._msgstr_plural, dict):
+            othermsgstr_plural = list(other._msgstr_plural.values())
         else:
             othermsgstr_plural = []
         if msgstr_plural > othermsgstr_plural:
@@ -1189,9 +1537,9 @@ class POEntry(_BaseEntry):
             return False
         if self.msgstr != '':
             return True
-        if self.msgstr_plural:
-            for pos in self.msgstr_plural:
-                if self.msgstr_plural[pos] == '':
+        if self._msgstr_plural:
+            for pos in self._msgstr_plural:
+                if self._msgstr_plural[pos] == '':
                     return False
             return True
         return False
@@ -1223,7 +1571,7 @@ class POEntry(_BaseEntry):
 
     @property
     def fuzzy(self):
-        return 'fuzzy' in self.flags
+        return self._flags is not None and 'fuzzy' in self._flags
 
     @fuzzy.setter
     def fuzzy(self, value):
@@ -1242,6 +1590,20 @@ class MOEntry(_BaseEntry):
     """
     Represents a mo file entry.
     """
+
+    __slots__ = (
+        'comment',
+        'tcomment',
+        '_occurrences',
+        '_flags',
+        'previous_msgctxt',
+        'previous_msgid',
+        'previous_msgid_plural',
+    )
+
+    occurrences = _lazy_container('occurrences', _LazyList)
+    flags = _lazy_container('flags', _LazyList)
+
     def __init__(self, *args, **kwargs):
         """
         Constructor, accepts the following keyword arguments,
@@ -1262,8 +1624,8 @@ class MOEntry(_BaseEntry):
         _BaseEntry.__init__(self, *args, **kwargs)
         self.comment = ''
         self.tcomment = ''
-        self.occurrences = []
-        self.flags = []
+        self._occurrences = None
+        self._flags = None
         self.previous_msgctxt = None
         self.previous_msgid = None
         self.previous_msgid_plural = None
@@ -1500,27 +1862,36 @@ class _POFileParser(object):
                 # are ignored
                 self.instance.append(self.current_entry)
 
-            # before returning the instance, check if there's metadata and if
-            # so extract it in a dict
-            metadataentry = self.instance.find('')
-            if metadataentry:  # metadata found
-                # remove the entry
-                self.instance.remove(metadataentry)
-                self.instance.metadata_is_fuzzy = metadataentry.flags
-                key = None
-                for msg in metadataentry.msgstr.splitlines():
-                    try:
-                        key, val = msg.split(':', 1)
-                        self.instance.metadata[key] = val.strip()
-                    except (ValueError, KeyError):
-                        if key is not None:
-                            self.instance.metadata[key] += '\n' + msg.strip()
+            self.extract_metadata()
         finally:
             # close opened file
             if not isinstance(self.fhandle, list):  # must be file
                 self.fhandle.close()
         return self.instance
 
+    def extract_metadata(self):
+        """
+        Check if there's metadata and if so extract it in a dict.
+        """
+        # Not find(''), that builds the index, which is of no use for just
+        # this entry
+        metadataentry = self.instance._best_match(
+            [e for e in self.instance if e.msgid == '' and not e.obsolete],
+            False
+        )
+        if metadataentry:  # metadata found
+            # remove the entry
+            self.instance.remove(metadataentry)
+            self.instance.metadata_is_fuzzy = metadataentry.flags
+            key = None
+            for msg in metadataentry.msgstr.splitlines():
+                try:
+                    key, val = msg.split(':', 1)
+                    self.instance.metadata[key] = val.strip()
+                except (ValueError, KeyError):
+                    if key is not None:
+                        self.instance.metadata[key] += '\n' + msg.strip()
+
     def add(self, symbol, states, next_state):
         """
         Add a transition to the state machine.
@@ -1707,6 +2078,276 @@ class _POFileParser(object):
         # don't change the current state
         return False
 # }}}
+# class _BulkPOFileParser {{{
+
+
+class _UnusualPOFile(Exception):
+    """
+    Raised by :class:`_BulkPOFileParser` for input it doesn't parse exactly
+    like :class:`_POFileParser`.
+    """
+
+
+def _unescaped_quote(st):
+    """
+    Whether ``st`` has a double quote without a backslash before it, same as
+    the regular expression the state machine uses, but counted instead.
+    """
+    return st.count('"') != st.count('\\"')
+
+
+def _bulk_unescape(st):
+    """
+    Same as :func:`unescape`, but with plain replacements when ``st`` has no
+    escaped backslash, since every backslash then starts its own escape.
+    """
+    if '\\' not in st:
+        return st
+    if '\\\\' in st:
+        return unescape(st)
+    return st.replace('\\n', '\n').replace('\\t', '\t').replace('\\"', '"') \
+        .replace('\\r', '\r').replace('\\v', '\v').replace('\\b', '\b') \
+        .replace('\\f', '\f')
+
+
+def _set_field(entry, field, parts):
+    """
+    Set a field of ``entry`` from the quoted parts of its lines. ``field`` is
+    an attribute name, or the index of a plural msgstr.
+    """
+    value = parts[0] if len(parts) == 1 else ''.join(parts)
+    if '\\' in value:
+        if len(parts) > 1 and any(part.endswith('\\') for part in parts):
+            # Each line is unescaped on its own
+            value = ''.join([_bulk_unescape(part) for part in parts])
+        else:
+            value = _bulk_unescape(value)
+    if field.__class__ is int:
+        entry.msgstr_plural[field] = value
+    else:
+        setattr(entry, field, value)
+
+
+class _BulkPOFileParser(_POFileParser):
+    """
+    A faster parser for well formed po files, used by :func:`pofile` before
+    the state machine.
+
+    The whole file is read at once and each entry is built from its lines
+    directly: fields are decoded when they are complete, and only unescaped
+    when they contain a backslash. Anything unusual, like comments between
+    msgid and msgstr, syntax errors or duplicate checks, raises
+    :class:`_UnusualPOFile` and the file is parsed by the state machine
+    instead, so both parsers always give the same result.
+    """
+
+    def add(self, symbol, states, next_state):
+        """
+        The bulk parser doesn't use the transitions of the state machine.
+        """
+
+    def parse(self):
+        """
+        Parse the file, or raise :class:`_UnusualPOFile`.
+        """
+        try:
+            if self.instance.check_for_duplicates:
+                raise _UnusualPOFile('duplicate checks')
+            if isinstance(self.fhandle, list):
+                lines = self.fhandle
+            else:
+                lines = self.fhandle.read().split('\n')
+            BOM = codecs.BOM_UTF8.decode('utf-8')
+            if lines and lines[0].startswith(BOM):
+                lines = [lines[0][len(BOM):]] + lines[1:]
+            self.parse_lines(lines)
+            self.extract_metadata()
+        finally:
+            # close opened file
+            if not isinstance(self.fhandle, list):  # must be file
+                self.fhandle.close()
+        return self.instance
+
+    def parse_lines(self, lines):
+        """
+        Build the entries of the instance from the lines of the file.
+        """
+        instance = self.instance
+        append = instance.append
+        entry = self.current_entry
+        prev_keywords = {
+            'msgid_plural': 'previous_msgid_plural',
+            'msgid': 'previous_msgid',
+            'msgctxt': 'previous_msgctxt',
+        }
+        # The states are the ones of the state machine, except that all
+        # comments share 'cm'
+        state = 'st'
+        # The field continuation lines are added to, and its quoted parts
+        field = None
+        parts = None
+        trailing_comment = False
+        has_lines = False
+
+        for linenum, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            has_lines = True
+
+            first = line[0]
+            obsolete = 0
+            if first == '#' and line.startswith('#~'):
+                tokens = line.split(None, 1)
+                if tokens[0] == '#~|':
+                    trailing_comment = True
+                    continue
+                if tokens[0] != '#~' or len(tokens) == 1:
+                    raise _UnusualPOFile(linenum)
+                line = line[3:].strip()
+                obsolete = 1
+                first = line[0]
+                if first == '#':
+                    raise _UnusualPOFile(linenum)
+
+            if first == '"':
+                if parts is None or len(line) < 2 or line[-1] != '"':
+                    raise _UnusualPOFile(linenum)
+                value = line[1:-1]
+                if '"' in value and _unescaped_quote(value):
+                    raise _UnusualPOFile(linenum)
+                parts.append(value)
+                trailing_comment = False
+                continue
+
+            # The current field is complete
+            if field is not None:
+                _set_field(entry, field, parts)
+                field = None
+                parts = None
+
+            if first == '#':
+                if state in ('ct', 'mi', 'mp'):
+                    raise _UnusualPOFile(linenum)
+                tokens = line.split(None, 1)
+                marker = tokens[0]
+                if marker == '#' or marker.startswith('##'):
+                    if line == '#':
+                        line += ' '
+                    if state in ('st', 'he'):
+                        if instance.header != '':
+                            instance.header += '\n'
+                        instance.header += line[2:]
+                        state = 'he'
+                        trailing_comment = True
+                        continue
+                elif len(tokens) == 1:
+                    raise _UnusualPOFile(linenum)
+                elif marker == '#|':
+                    rest = tokens[1]
+                    if rest[0] == '"':
+                        raise _UnusualPOFile(linenum)
+                    tokens = rest.split(None, 1)
+                    if len(tokens) == 1 or tokens[0] not in prev_keywords:
+                        raise _UnusualPOFile(linenum)
+                    value = tokens[1]
+                    if len(value) < 2 or value[0] != '"' or \
+                       value[-1] != '"':
+                        raise _UnusualPOFile(linenum)
+                elif marker not in ('#:', '#,', '#.'):
+                    raise _UnusualPOFile(linenum)
+
+                if state in ('ms', 'mx'):
+                    append(entry)
+                    entry = POEntry(linenum=linenum)
+                state = 'cm'
+                trailing_comment = True
+
+                if marker == '#:':
+                    occurrences = entry._occurrences
+                    if occurrences is None:
+                        occurrences = entry._occurrences = []
+                    for occurrence in line[3:].split():
+                        fil, sep, num = occurrence.rpartition(':')
+                        if sep and num.isdigit():
+                            occurrences.append((fil, num))
+                        else:
+                            occurrences.append((occurrence, ''))
+                elif marker == '#,':
+                    flags = [c.strip() for c in line[3:].split(',')]
+                    if entry._flags is None:
+                        entry._flags = flags
+                    else:
+                        entry._flags += flags
+                elif marker == '#.':
+                    if entry.comment != '':
+                        entry.comment += '\n'
+                    entry.comment += line[3:]
+                elif marker == '#|':
+                    field = prev_keywords[tokens[0]]
+                    parts = [value[1:-1]]
+                else:
+                    if entry.tcomment != '':
+                        entry.tcomment += '\n'
+                    tcomment = line.lstrip('#')
+                    if tcomment.startswith(' '):
+                        tcomment = tcomment[1:]
+                    entry.tcomment += tcomment
+                continue
+
+            tokens = line.split(None, 1)
+            if len(tokens) == 1:
+                raise _UnusualPOFile(linenum)
+            keyword, value = tokens
+            if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+                raise _UnusualPOFile(linenum)
+            parts = [value[1:-1]]
+            if '"' in parts[0] and _unescaped_quote(parts[0]):
+                raise _UnusualPOFile(linenum)
+            trailing_comment = False
+
+            if keyword == 'msgid':
+                if state in ('ms', 'mx'):
+                    append(entry)
+                    entry = POEntry(linenum=linenum)
+                elif state in ('mi', 'mp'):
+                    raise _UnusualPOFile(linenum)
+                entry.obsolete = obsolete
+                field = 'msgid'
+                state = 'mi'
+            elif keyword == 'msgstr':
+                if state not in ('mi', 'mp'):
+                    raise _UnusualPOFile(linenum)
+                field = 'msgstr'
+                state = 'ms'
+            elif keyword[:7] == 'msgstr[':
+                if state not in ('mi', 'mp', 'mx') or len(keyword) != 9 or \
+                   keyword[7] not in '0123456789' or keyword[8] != ']':
+                    raise _UnusualPOFile(linenum)
+                field = int(keyword[7])
+                state = 'mx'
+            elif keyword == 'msgctxt':
+                if state in ('ms', 'mx'):
+                    append(entry)
+                    entry = POEntry(linenum=linenum)
+                elif state in ('ct', 'mi', 'mp'):
+                    raise _UnusualPOFile(linenum)
+                field = 'msgctxt'
+                state = 'ct'
+            elif keyword == 'msgid_plural':
+                if state != 'mi':
+                    raise _UnusualPOFile(linenum)
+                field = 'msgid_plural'
+                state = 'mp'
+            else:
+                raise _UnusualPOFile(linenum)
+
+        if field is not None:
+            _set_field(entry, field, parts)
+        if has_lines and not trailing_comment:
+            # Trailing comments are ignored, like in the state machine
+            append(entry)
+# }}}
 # class _MOFileParser {{{
 
 
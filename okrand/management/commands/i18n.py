@@ -1,16 +1,40 @@
 from django.core.management.base import BaseCommand
 
-from okrand import update_po_files
+from okrand import (
+    update_po_files,
+    watch_po_files,
+)
 
 
 class Command(BaseCommand):
     help = 'Okrand internationalization'
 
-    # def add_arguments(self, parser):
-    #     parser.add_argument('interactive', type=bool)
+    def add_arguments(self, parser):
+        # parser.add_argument('interactive', type=bool)
+        parser.add_argument('--jobs', type=int, default=None, help='Number of processes to parse source files with. 0 means one per CPU.')
+        parser.add_argument('--since', default=None, metavar='REF', help='Only parse files changed since this git ref, and use the cached results for the rest. Needs cache_dir to be configured to be faster.')
+        parser.add_argument('--watch', action='store_true', help='Keep running, and update the .po files when source files change.')
 
     def handle(self, *args, **options):
-        update_po_files()
+        if options['watch']:
+            self.watch(jobs=options['jobs'])
+            return
+
+        result = update_po_files(jobs=options['jobs'], since=options['since'])
+        self.stdout.write(result.stats.summary())
+
+    def watch(self, *, jobs):
+        results = watch_po_files(jobs=jobs)
+        try:
+            result = next(results)
+            self.stdout.write(result.stats.summary())
+            self.stdout.write('Watching for changes...')
+            for result in results:
+                self.stdout.write(f'Updated: {len(result.new_strings)} new strings, {len(result.newly_obsolete_strings)} newly obsolete strings')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            results.close()
 
 #
 # def main_interactive():
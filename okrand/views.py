@@ -45,6 +45,14 @@ def msgid_to_key(msgid):
     return r
 
 
+def entry_to_key(entry):
+    # Entries with the same msgid and another msgctxt need their own fields
+    key = msgid_to_key(entry.msgid)
+    if entry.msgctxt is not None:
+        key = f'{msgid_to_key(entry.msgctxt)}$ctx${key}'
+    return key
+
+
 def i18n(request):
     if not request.user.is_superuser or not settings.DEBUG:
         raise Http404()
@@ -152,20 +160,23 @@ def i18n(request):
         for x in update_po_result.new_strings:
             po.append(polib.POEntry(msgid=x))
 
-    def process(m):
-        m.problems = []
+    def find_problems(m):
+        problems = []
         if not m.msgid or not m.msgstr:
-            return
+            return problems
 
         if m.msgid[0].isupper() != m.msgstr[0].isupper() and m.msgstr[0].upper() != m.msgstr[0]:
-            m.problems.append('Case differs on first character')
+            problems.append('Case differs on first character')
 
         if m.msgid.count('{}') != m.msgstr.count('{}'):
-            m.problems.append('Different amount of {} in strings')
+            problems.append('Different amount of {} in strings')
+
+        return problems
 
     items = sorted(po, key=lambda x: x.msgid.lower())
-    for m in items:
-        process(m)
+    # Kept on the side, entries don't have room for extra attributes. By entry, not msgid: the same msgid can be in
+    # several entries, with another msgctxt or obsolete.
+    problems_by_entry = {id(m): find_problems(m) for m in items}
 
     # Form conf from this point onwards
     def fields_from_items(items):
@@ -175,30 +186,33 @@ def i18n(request):
                 continue
             if x.msgstr_plural:
                 for k, v in x.msgstr_plural.items():
-                    result[f'{msgid_to_key(x.msgid)}${k}'] = Field(
+                    result[f'{entry_to_key(x)}${k}'] = Field(
                         group=x.msgid,
                         initial=v,
                         display_name=x.msgid + f" (x{k+1})",
                         help_text=f'number of items {k+1}',
                         required=False,
                         extra__msgid=x.msgid,
+                        extra__msgctxt=x.msgctxt,
                         extra__plural_index=k,
                     )
             else:
-                result[msgid_to_key(x.msgid)] = Field(
+                result[entry_to_key(x)] = Field(
                     group=x.msgid,
                     initial=x.msgstr,
                     display_name=x.msgid,
-                    help_text='\n'.join(getattr(x, 'problems', [])),
+                    help_text='\n'.join(problems_by_entry[id(x)]),
                     required=False,
                     extra__msgid=x.msgid,
+                    extra__msgctxt=x.msgctxt,
                     extra__plural_index=None,
                 )
-            result[msgid_to_key(x.msgid) + '_ignore'] = Field.boolean(
+            result[entry_to_key(x) + '_ignore'] = Field.boolean(
                 group=x.msgid,
                 display_name='Ignore',
                 required=False,
                 extra__msgid=x.msgid,
+                extra__msgctxt=x.msgctxt,
                 extra__plural_index=None,
                 extra__ignore_flag=True,
                 input__attrs__style={
@@ -215,7 +229,7 @@ def i18n(request):
             return
 
         for field in form.fields.values():
-            m = po.find(field.extra.msgid)
+            m = po.find(field.extra.msgid, msgctxt=field.extra.msgctxt)
             if m is None:
                 continue
 
@@ -324,7 +338,7 @@ def i18n(request):
 
             problems=Form(
                 title='Problems',
-                fields=fields_from_items(x for x in items if x.problems and not x.obsolete),
+                fields=fields_from_items(x for x in items if problems_by_entry[id(x)] and not x.obsolete),
                 **save_button,
             ),
 
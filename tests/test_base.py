@@ -1,3 +1,7 @@
+import os
+import shutil
+import subprocess
+import threading
 from pathlib import Path
 
 import pytest
@@ -10,25 +14,50 @@ from django.utils.translation import (
     trans_real,
 )
 from okrand._vendored.polib import (
+    _BulkPOFileParser,
+    _POFileParser,
+    _UnusualPOFile,
     POEntry,
+    pofile,
     POFile,
 )
 
 from okrand import (
     _update_language,
+    config,
+    ExtractionStats,
+    ExtractorRegistry,
+    find_source_files,
+    find_source_strings,
+    files_digest,
+    git_changed_files,
+    git_files,
+    GitException,
+    IgnoreMatcher,
     ignore_filename,
     normalize_func,
     parse_django_template,
+    parse_django_template_tokens,
+    parse_elm,
+    parse_elm_regex,
     parse_js,
+    parse_js_regex,
     parse_python,
+    parse_python_tokens,
+    parse_vue,
     read_config,
+    SourcePoller,
     String,
+    StringIndex,
     translations_for_all_models,
     translations_for_model,
+    UniqueStrings,
+    UnknownFileEnumerationException,
     UnknownSortException,
     update_language,
     update_po_files,
     UpdateResult,
+    watch_po_files,
 )
 from okrand.apps import (
     upgrade_plural,
@@ -138,6 +167,285 @@ def test_ignore_filename():
     assert not ignore_filename('foo/bar/baz.py', ignore_list=['.*foobar.*'])
 
 
+def test_pofile_find_index():
+    import pickle
+
+    po = POFile()
+    foo = POEntry(msgid='foo')
+    foo_context = POEntry(msgid='foo', msgctxt='context')
+    bar = POEntry(msgid='bar', obsolete=True)
+    po.extend([foo_context, foo, bar])
+
+    assert po.find('foo') is foo
+    assert po.find('foo', msgctxt='context') is foo_context
+    assert po.find('foo', msgctxt='other') is None
+    assert po.find('bar') is None
+    assert po.find('bar', include_obsolete_entries=True) is bar
+    assert po.find('', by='msgstr') is foo
+    assert foo in po
+
+    # Changing the msgid of an entry moves it in the index
+    foo.msgid = 'baz'
+    assert po.find('baz') is foo
+    assert po.find('foo') is foo_context
+    foo.msgid = 'foo'
+    assert po.find('baz') is None
+    assert po.find('foo') is foo
+
+    po.remove(foo)
+    assert po.find('foo') is foo_context
+    po.insert(0, foo)
+    po.sort(key=lambda x: x.msgid)
+    assert po.find('foo') is foo
+    assert po.find('foo', msgctxt='context') is foo_context
+    del po[:]
+    assert po.find('foo') is None
+
+    po.append(foo)
+    copy = pickle.loads(pickle.dumps(po))
+    assert copy.find('foo').msgid == 'foo'
+    # Entries removed from a file don't change its index
+    po.clear()
+    foo.msgid = 'moved'
+    assert po.find('moved') is None
+
+    po = POFile(check_for_duplicates=True)
+    po.append(POEntry(msgid='foo'))
+    with pytest.raises(ValueError):
+        po.insert(0, POEntry(msgid='foo'))
+
+
+def test_pofile_find_constant_time():
+    class CountingPOFile(POFile):
+        iterations = 0
+
+        def __iter__(self):
+            self.iterations += 1
+            return super().__iter__()
+
+    po = CountingPOFile(check_for_duplicates=True)
+    for i in range(1000):
+        po.append(POEntry(msgid=f'msgid {i}', msgstr=f'msgstr {i}'))
+
+    # The entries are only gone through once, to build the index, which is then kept up to date
+    for i in range(1000):
+        assert po.find(f'msgid {i}').msgstr == f'msgstr {i}'
+    po.append(POEntry(msgid='new', msgstr='appended'))
+    assert po.find('new').msgstr == 'appended'
+    assert po.find('does not exist') is None
+    assert po.iterations == 1
+
+
+def test_pofile_index_mutations():
+    po = POFile()
+    a = POEntry(msgid='a', msgstr='no context')
+    a_ctx = POEntry(msgid='a', msgctxt='ctx', msgstr='context')
+    b = POEntry(msgid='b')
+    po.extend([a_ctx, a, b])
+
+    # Entries are indexed by msgctxt and msgid
+    assert po.find('a') is a
+    assert po.find('a', msgctxt='ctx') is a_ctx
+    assert po.find('a', msgctxt='other') is None
+    assert POEntry(msgid='a', msgctxt='ctx') in po
+
+    # The index is kept up to date, not built again
+    assert po._index is not None
+    index = po._index
+    po.remove(a)
+    assert po.find('a') is a_ctx
+    assert po.find('a', msgctxt=None) is None
+    po.sort()
+    po.reverse()
+    assert po.find('b') is b
+    a_ctx.msgctxt = 'changed'
+    assert po.find('a', msgctxt='ctx') is None
+    assert po.find('a', msgctxt='changed') is a_ctx
+    a_ctx.msgid = 'c'
+    assert po.find('a') is None
+    assert po.find('c', msgctxt='changed') is a_ctx
+    del po[po.index(b)]
+    assert po.find('b') is None
+    po.insert(0, a)
+    assert po.pop() is a_ctx
+    assert po.find('c', msgctxt='changed') is None
+    po[0] = b
+    assert po.find('a') is None and po.find('b') is b
+    po[:] = [a, a_ctx]
+    assert po.find('b') is None and po.find('a') is a
+    assert po._index is index
+
+    # Several entries with the same msgid and msgctxt come in file order
+    obsolete = POEntry(msgid='a', msgstr='obsolete', obsolete=True)
+    po.insert(0, obsolete)
+    assert po.find('a') is a
+    assert po.find('a', include_obsolete_entries=True) is a
+    po.remove(a)
+    assert po.find('a', include_obsolete_entries=True) is obsolete
+
+
+def test_pofile_metadata_without_index():
+    po = pofile('msgid ""\nmsgstr ""\n"Language: sv\\n"\n\nmsgid "a"\nmsgstr "b"\n')
+    assert po.metadata == {'Language': 'sv'}
+    assert po._index is None
+    assert po.find('a').msgstr == 'b'
+
+
+def test_po_entry_lazy_containers():
+    import pickle
+
+    entry = POEntry(msgid='foo')
+    assert not hasattr(entry, '__dict__')
+    assert not entry.fuzzy
+    assert str(entry) == 'msgid "foo"\nmsgstr ""\n'
+
+    # Reading doesn't store anything
+    assert entry.flags == [] and entry.occurrences == [] and entry.msgstr_plural == {}
+    assert 'fuzzy' not in entry.flags and not entry.msgstr_plural.items()
+    assert (entry._flags, entry._occurrences, entry._msgstr_plural) == (None, None, None)
+    other = POEntry(msgid='other')
+    other.flags = entry.flags
+    assert other._flags is None
+
+    # Created when something is added, and then kept
+    flags = entry.flags
+    flags.append('fuzzy')
+    flags.append('python-format')
+    entry.occurrences += [('foo.py', '1')]
+    entry.msgstr_plural[0] = 'foos'
+    assert entry.fuzzy
+    assert entry.flags == ['fuzzy', 'python-format']
+    assert entry.occurrences == [('foo.py', '1')]
+    assert entry.msgstr_plural == {0: 'foos'}
+
+    copy = pickle.loads(pickle.dumps(entry))
+    assert copy == entry
+    assert type(copy.flags) is list and copy.flags == ['fuzzy', 'python-format']
+
+
+def test_po_file_memory():
+    import tracemalloc
+
+    msgids = [f'msgid {i}' for i in range(100_000)]
+    msgstrs = [f'msgstr {i}' for i in range(100_000)]
+
+    tracemalloc.start()
+    try:
+        po = POFile()
+        for msgid, msgstr in zip(msgids, msgstrs):
+            po.append(POEntry(msgid=msgid, msgstr=msgstr))
+        # Including the lookup index
+        assert po.find('msgid 1').msgstr == 'msgstr 1'
+        # Reading the containers, like the views do, doesn't create them
+        for entry in po:
+            assert not entry.flags and not entry.occurrences and not entry.msgstr_plural
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # About 390 bytes per entry with an instance dict and empty lists and dicts, without the index
+    assert size / len(po) < 250
+
+
+def po_file_state(po):
+    entries = [
+        {
+            name: getattr(entry, name)
+            for cls in type(entry).__mro__
+            for name in getattr(cls, '__slots__', ())
+            if name != '_owners'
+        } | {'obsolete_type': type(entry.obsolete)}
+        for entry in po
+    ]
+    return po.header, po.metadata, po.metadata_is_fuzzy, po.encoding, str(po), entries
+
+
+def test_bulk_po_parser():
+    usual = [
+        '',
+        '\n\n',
+        '\ufeff# Header\n'
+        '#\n'
+        '# more\n'
+        'msgid ""\n'
+        'msgstr ""\n'
+        '"Language: sv\\n"\n'
+        '"X-Foo: a\\n"\n'
+        '" continued\\n"\n'
+        '\n'
+        '#. generated\n'
+        '#. two\n'
+        '#: a.py:1 b.py c:d:3 :4\n'
+        '#, fuzzy, python-format\n'
+        '#| msgctxt "old"\n'
+        '#| msgid "old id"\n'
+        '#| msgid_plural "old ids"\n'
+        'msgctxt "ctx"\n'
+        'msgid "one"\n'
+        'msgid_plural "many"\n'
+        'msgstr[0] "en"\n'
+        'msgstr[1] "m\\"a\\tny"\n'
+        '"\\n"\n'
+        '# tc\n'
+        '##double\n'
+        '#\n'
+        # Unescaped per line, so this is a backslash and an n
+        'msgid "a\\"\n'
+        '"n"\n'
+        'msgstr "b"\n'
+        'msgid "no blank line"\n'
+        'msgstr ""\n'
+        '\n'
+        '#~ msgctxt "o"\n'
+        '#~ msgid "obs"\n'
+        '#~ msgstr "olete"\n'
+        '#~ "cont"\n'
+        '#~| msgid "x"\n',
+        '#, fuzzy\nmsgid ""\nmsgstr "Language: sv\\n"\n\nmsgid "x"\nmsgstr "y"\n# trailing comment\n',
+        'msgid "x"\nmsgstr "y"',
+        'msgid "x"\n\nmsgstr "y"\n',
+        '#| msgid "a"\n"b"\nmsgid "x"\nmsgstr "y"\n',
+        'msgid "\\\\n\\\\\\"\\r\\v\\b\\f\\q"\nmsgstr "\\\\"\n"\\\\\\\\t\\\\"\n',
+        str(Path(__file__).parent.parent / 'locale' / 'tlh' / 'LC_MESSAGES' / 'django.po'),
+    ]
+    for content in usual:
+        assert po_file_state(_BulkPOFileParser(content).parse()) == po_file_state(_POFileParser(content).parse())
+
+    unusual = [
+        'msgid "x"\n# comment\nmsgstr "y"\n',
+        'msgid "x"\nmsgstr "y"\n#,\n"z"\n',
+        'msgid "x"\nmsgid_plural "y"\nmsgstr[10] "z"\n',
+        'msgid "x"\nmsgstr "y"\n#~ #, fuzzy\n',
+        '#| msgid "a"\n#| "b"\nmsgid "x"\nmsgstr "y"\n',
+        'msgid "x"\nmsgstr[0]"y"\n',
+    ]
+    for content in unusual:
+        with pytest.raises(_UnusualPOFile):
+            _BulkPOFileParser(content).parse()
+        # Parsed by the state machine instead
+        assert po_file_state(pofile(content)) == po_file_state(_POFileParser(content).parse())
+
+    with pytest.raises(_UnusualPOFile):
+        _BulkPOFileParser('msgid "x"\nmsgstr "y"\n', check_for_duplicates=True).parse()
+
+    with pytest.raises(IOError, match='unescaped double quote'):
+        pofile('msgid "a"b"\nmsgstr ""\n')
+
+
+def test_bulk_po_parser_many_entries():
+    # The same file as benchmarks/po_parser.py, smaller
+    content = '# Header\nmsgid ""\nmsgstr ""\n"Language: sv\\n"\n\n' + ''.join(
+        f'#: foo/bar.py:{i} foo/baz.py:{i}\n'
+        f'{"#, python-format" if i % 3 else "#. generated"}\n'
+        f'msgid "Message number %(number)s of the project, {i}"\n'
+        f'msgstr ""\n'
+        f'"Meddelande nummer %(number)s av projektet, \\"{i}\\"\\n"\n'
+        f'"on two lines"\n\n'
+        for i in range(1000)
+    )
+    assert po_file_state(_BulkPOFileParser(content).parse()) == po_file_state(_POFileParser(content).parse())
+
+
 def test__update_language():
     po_file = POFile()
     strings = [
@@ -563,3 +871,923 @@ def test_update_language(monkeypatch):
         assert result.new_strings == []
         assert result.new_strings == []
         assert result.previously_obsolete_strings == ['success']
+
+
+@pytest.fixture
+def project(tmp_path, settings, monkeypatch):
+    settings.BASE_DIR = tmp_path
+    monkeypatch.setitem(config, 'django_model_upgrade', '0')
+    return tmp_path
+
+
+def find_msgids(**kwargs):
+    stats = ExtractionStats()
+    msgids = [x.msgid for x in find_source_strings(ignore_list=[], stats=stats, **kwargs)]
+    return msgids, stats
+
+
+def test_extraction_cache(project, monkeypatch):
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    source = project / 'foo.py'
+    source.write_text("gettext('foo')\n")
+
+    assert find_msgids() == (['foo'], ExtractionStats(files_parsed=1))
+    assert (project / '.okrand_cache' / 'extraction.pickle').exists()
+    assert find_msgids() == (['foo'], ExtractionStats(files_from_cache=1))
+
+    # touched, but same content
+    os.utime(source, ns=(0, 0))
+    assert find_msgids() == (['foo'], ExtractionStats(files_from_cache=1))
+
+    source.write_text("gettext('foobar')\n")
+    assert find_msgids() == (['foobar'], ExtractionStats(files_parsed=1))
+    assert find_msgids() == (['foobar'], ExtractionStats(files_from_cache=1))
+
+    # settings that don't affect extraction keep the cache
+    monkeypatch.setitem(config, 'sort', 'alphabetical')
+    monkeypatch.setitem(config, 'renames', '0')
+    assert find_msgids() == (['foobar'], ExtractionStats(files_from_cache=1))
+
+    # the ones that do invalidate it
+    monkeypatch.setitem(config, 'ignore', '.*/does_not_exist.py')
+    assert find_msgids() == (['foobar'], ExtractionStats(files_parsed=1))
+    monkeypatch.setitem(config, 'python_extractor', 'tokenize')
+    assert find_msgids() == (['foobar'], ExtractionStats(files_parsed=1))
+
+
+def test_parallel_extraction_same_as_serial(project, monkeypatch):
+    import okrand
+
+    for i in range(20):
+        (project / f'foo_{i}.py').write_text(f"gettext('foo {i}')\nngettext('bar {i}', 'bars {i}', 2)\n")
+        (project / f'foo_{i}.html').write_text(f"{{% load i18n %}}{{% trans 'baz {i}' %}}")
+        (project / f'foo_{i}.js').write_text(f"gettext('js {i}')")
+
+    serial = list(find_source_strings(ignore_list=[]))
+    assert len(serial) == 80
+
+    stats = ExtractionStats()
+    assert list(find_source_strings(ignore_list=[], stats=stats, jobs=3)) == serial
+    assert stats == ExtractionStats(files_parsed=60)
+
+    # Memory mapped files are mapped again by the worker, the others are sent along
+    monkeypatch.setitem(config, 'mmap_threshold', '10')
+    assert list(find_source_strings(ignore_list=[], jobs=3)) == serial
+    monkeypatch.delitem(config, 'mmap_threshold')
+
+    # With more files than fit in flight at once
+    monkeypatch.setattr(okrand, 'PARALLEL_CHUNK_SIZE', 1)
+    assert list(find_source_strings(ignore_list=[], jobs=3)) == serial
+
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    (project / 'foo_3.py').write_text("gettext('changed')")
+    assert list(find_source_strings(ignore_list=[], jobs=3))
+    stats = ExtractionStats()
+    parallel_with_cache = list(find_source_strings(ignore_list=[], stats=stats, jobs=3))
+    assert stats == ExtractionStats(files_from_cache=60)
+    assert parallel_with_cache == list(find_source_strings(ignore_list=[]))
+
+
+def test_prefilter(project, monkeypatch):
+    (project / 'no_translations.py').write_text("def foo():\n    return 'foo'\n")
+    (project / 'no_translations.html').write_text("{% load i18n %}<div>{{ foo }}</div>")
+    (project / 'underscore.py').write_text("_ ('foo')\n")
+    (project / 'underscore.html').write_text("{{ _('bar') }}")
+    (project / 'trans.html').write_text("{% load i18n %}{%translate 'baz' %}")
+    (project / 'elm.elm').write_text('x = _ "elm"')
+
+    msgids, stats = find_msgids()
+    assert sorted(msgids) == ['bar', 'baz', 'elm', 'foo']
+    assert stats == ExtractionStats(files_parsed=4, files_skipped_by_prefilter=2)
+
+    monkeypatch.setitem(config, 'prefilter', '0')
+    msgids_without_prefilter, stats = find_msgids()
+    assert msgids_without_prefilter == msgids
+    assert stats == ExtractionStats(files_parsed=6)
+
+
+python_corpus = [
+    """
+class Foo:
+    def foo(self):
+        something = gettext('foo') + 'asd'
+        gettext_lazy("bar")
+        ngettext("singular", "plural", 3)
+        pgettext("context", "baz")
+        npgettext("context", "singular2", ' plural2 ')
+        gettext(
+            'implicit '  # comment
+            "concatenation"
+        )
+        self.gettext('not this')
+        _ = gettext
+""",
+    """
+@register(gettext('decorator'))
+def foo() -> gettext('return'):
+    return gettext('body')
+""",
+    "x = {gettext('key'): gettext('value'), gettext('key 2'): 3, 'key 3': gettext('value 2')}",
+    "x = gettext('body') if gettext('test') else gettext('orelse')",
+    "x = f\"{gettext('in f-string')}\" + gettext('outside')",
+    "match x:\n    case gettext('not a call'):\n        pass",
+    "(gettext)('parenthesized')",
+    "f(a=gettext('keyword'), *gettext('positional'))",
+]
+
+
+@pytest.mark.parametrize('source', python_corpus + [
+    path.read_text()
+    for path in sorted((Path(__file__).parent.parent / 'okrand').glob('**/*.py')) + sorted(Path(__file__).parent.glob('*.py'))
+])
+def test_python_tokens_same_as_ast(source):
+    assert [(x, x.line) for x in parse_python_tokens(source)] == [(x, x.line) for x in parse_python(source)]
+
+
+def test_python_tokens_does_not_build_ast(monkeypatch):
+    import okrand
+
+    def fail(content):
+        assert False  # pragma: no cover
+
+    monkeypatch.setattr(okrand, 'parse_python', fail)
+    singular, plural = collect(parse_python_tokens(python_corpus[0]))
+    assert singular == {'singular', 'foo', 'bar', 'baz', 'singular2', 'implicit concatenation'}
+    assert plural == {'plural', ' plural2 '}
+
+
+template_corpus = [
+    """
+{% load i18n %}
+{% blocktranslate count counter=list|length with foo=foo bar=3 %}singular {{ x }}{% plural %}plural {{ y }}{% endblocktranslate %}
+{% blocktrans %}singular 2{% endblocktrans %}
+{% trans "foo" %}
+{% translate 'bar'|upper as bar %}
+{% trans "escaped \\"quote\\"" context "some context" %}
+""",
+    """
+{% load i18n %}
+{{ _('foo') }}
+{% with x=_('bar') %}
+    {{ x }}
+{% endwith %}
+{% if foo %}{% trans "in if" %}{% else %}{% trans "in else" %}{% endif %}
+{% comment %}{% trans "commented out" %}{% endcomment %}
+{% verbatim %}{% trans "verbatim" %}{% endverbatim %}
+""",
+]
+
+
+@pytest.mark.parametrize('source', template_corpus)
+def test_django_template_tokens_same_as_template(source):
+    assert sorted(map(repr, parse_django_template_tokens(source))) == sorted(map(repr, parse_django_template(source)))
+
+
+def test_string_representation():
+    import pickle
+
+    from django.utils.safestring import mark_safe
+
+    from okrand import (
+        Domain,
+        TranslationFunction,
+    )
+
+    # Equal msgids found in different places are stored once
+    a = String(msgid=''.join(['fo', 'o']), translation_function='gettext', domain='django')
+    b = String(msgid=''.join(['f', 'oo']), translation_function='gettext', domain='django', line=7)
+    assert a == b
+    assert a.msgid is b.msgid
+    assert not hasattr(a, '__dict__')
+
+    # The enum members work like the strings they replace
+    assert a.domain is Domain.django
+    assert a.translation_function is TranslationFunction.gettext
+    assert a.domain == 'django' and {'django': 1}[a.domain] == 1
+    assert f'{a.domain}.po' == str(a.domain) + '.po' == 'django.po'
+    assert pickle.loads(pickle.dumps(a)) == a
+
+    # Plugins can use their own values
+    c = String(msgid=mark_safe('bar'), translation_function='schema', domain='other')
+    assert (c.msgid, c.translation_function, c.domain) == ('bar', 'schema', 'other')
+    assert type(c.msgid) is str
+
+
+def test_django_template_tokens_no_tag_libraries():
+    singular, plural = collect(parse_django_template_tokens(
+        """
+{% load some_library_that_does_not_exist %}
+{% some_custom_tag %}
+{% trans "foo" %}
+"""))
+    assert singular == {'foo'}
+
+
+def test_js_lexer():
+    strings = list(parse_js(
+        """
+        a = `template ${gettext('in template')} and ${ {a: 1}.a } ${ngettext('x', 'xs', n)}`;
+        b = /it's a regex/.test(x) ? $gettext('after regex') : 1;
+        c = x / 2 / gettext("after division");
+        // gettext('line comment')
+        /* gettext('block comment') */
+        d = "gettext('in a string')";
+        e = gettext(`template literal`) + npgettext('context', 'singular', 'plural', n);
+        f = gettext('concatenated' + x) + pgettext('only context') + gettext(variable);
+        g = this.$gettext('vue-gettext method');
+        """))
+    assert [(x.msgid, x.msgid_plural, x.context) for x in strings] == [
+        ('in template', None, ''),
+        ('x', 'xs', ''),
+        ('after regex', None, ''),
+        ('after division', None, ''),
+        ('template literal', None, ''),
+        ('singular', 'plural', 'context'),
+        ('vue-gettext method', None, ''),
+    ]
+
+
+js_corpus = [
+    """
+    function foo() {
+        something = gettext('foo') + 'asd'
+        ngettext("singular", "plural")
+        pgettext("context", "baz")
+        npgettext ( "context"   , "singular2", ' plural2 '  )
+        asd_foo("don't catch this please")
+        asd_pgettext("and not", "this either")
+        gettext('escaped \\' quote')
+    }
+    """,
+]
+
+
+@pytest.mark.parametrize('source', js_corpus)
+def test_js_lexer_same_as_regex(source):
+    assert [(x, x.line) for x in parse_js(source)] == [(x, x.line) for x in parse_js_regex(source)]
+
+
+def test_elm_lexer():
+    source = """
+x = gettext "foo"
+y = I18n.ngettext "singular", "plural" n
+z = pgettext "context", "baz"
+{- gettext "block comment" -}
+-- gettext "line comment"
+"""
+    assert list(parse_elm(source)) == list(parse_elm_regex(source.split('{-')[0]))
+    assert [x.msgid for x in parse_elm(source)] == ['foo', 'singular', 'baz']
+    assert [(x, x.line) for x in parse_elm(source.encode())] == [(x, x.line) for x in parse_elm(source)]
+
+
+vue_source = """<template>
+  <div :title="gettext('title')" class="x">
+    <p>Don't {{ $t('hello') }}</p>
+    <template v-if="ok"><span @click="go(pgettext('context', 'clicked'))"/></template>
+    <!-- {{ gettext('commented out') }} -->
+  </div>
+</template>
+
+<script setup>
+const foo = ngettext('singular', 'plural', n)
+</script>
+
+<style>
+.gettext('css') { color: red }
+</style>
+
+<docs>gettext('custom block')</docs>
+"""
+
+
+def test_vue_sfc():
+    expected = [
+        ('title', 2),
+        ('hello', 3),
+        ('clicked', 4),
+        ('singular', 10),
+    ]
+    assert [(x.msgid, x.line) for x in parse_vue(vue_source)] == expected
+    assert [(x.msgid, x.line) for x in parse_vue(vue_source.encode())] == expected
+    assert [x.context for x in parse_vue(vue_source)] == ['', '', 'context', '']
+    assert [x.msgid for x in parse_vue('<template><p>{{ $gettext("dollar") }}</p></template>')] == ['dollar']
+    # The whole file lexer finds strings in the css and custom blocks too
+    assert {'css', 'custom block'} <= {x.msgid for x in parse_js(vue_source)}
+
+
+@pytest.mark.parametrize('source', js_corpus)
+def test_js_lexer_bytes(source):
+    source += "gettext('non-ascii: åäö')\n"
+    assert [(x, x.line) for x in parse_js(source.encode())] == [(x, x.line) for x in parse_js(source)]
+
+
+def test_ignore_matcher():
+    matcher = IgnoreMatcher(['.*/node_modules/.*', '.*/static/dist.*', '.*/foo.py', 'a|.*/b/.*', r'.*/escaped\.*', '(?i).*/CASE/.*'])
+    assert matcher.ignores_file('/x/node_modules/y.js')
+    assert matcher.ignores_file('/x/foo.py')
+    assert matcher.ignores_file('/x/case/y.py')
+    assert not matcher.ignores_file('/x/bar.py')
+
+    assert matcher.ignores_directory('/x/node_modules')
+    assert matcher.ignores_directory('/x/static/dist')
+    assert not matcher.ignores_directory('/x/static')
+    assert not matcher.ignores_directory('/x/foo.py')
+    # top level alternatives and escaped dots can't be used for directories
+    assert not matcher.ignores_directory('/x/b')
+    assert not matcher.ignores_directory('/x/escaped')
+
+
+def test_find_source_files_prunes_ignored_directories(project, monkeypatch):
+    (project / 'node_modules' / 'lib').mkdir(parents=True)
+    (project / 'node_modules' / 'lib' / 'foo.js').write_text("gettext('ignored')")
+    (project / 'foo.js').write_text("gettext('foo')")
+
+    walked = []
+    original_walk = os.walk
+
+    def walk(path):
+        for root, dirs, files in original_walk(path):
+            walked.append(root)
+            yield root, dirs, files
+
+    monkeypatch.setattr(os, 'walk', walk)
+    assert list(find_source_files(['.*/node_modules/.*'])) == [project / 'foo.js']
+    assert walked == [str(project)]
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+def test_find_source_files_git(project, monkeypatch):
+    def git(*args):
+        subprocess.run(['git', *args], cwd=project, check=True, capture_output=True)
+
+    git('init', '-q')
+    (project / '.gitignore').write_text('ignored.js\n')
+    (project / 'tracked.js').write_text("gettext('tracked')")
+    (project / 'deleted.js').write_text("gettext('deleted')")
+    (project / 'ignored.js').write_text("gettext('ignored')")
+    (project / 'sub').mkdir()
+    (project / 'sub' / 'untracked.py').write_text("gettext('untracked')")
+    (project / 'sub' / 'skipped.py').write_text("gettext('skipped')")
+    (project / 'README.txt').write_text("gettext('not source')")
+    git('add', 'tracked.js', 'deleted.js')
+    (project / 'deleted.js').unlink()
+
+    expected = [project / 'sub' / 'untracked.py', project / 'tracked.js']
+    assert sorted(git_files(project)) == ['.gitignore', 'README.txt', 'sub/skipped.py', 'sub/untracked.py', 'tracked.js']
+    assert sorted(find_source_files(['.*/skipped.py'])) == expected
+
+    monkeypatch.setitem(config, 'file_enumeration', 'walk')
+    assert sorted(find_source_files(['.*/skipped.py'])) == expected
+
+
+def test_find_source_files_not_git(project, monkeypatch):
+    (project / 'foo.js').write_text("gettext('foo')")
+    assert git_files(project) is None
+    assert list(find_source_files([])) == [project / 'foo.js']
+
+    monkeypatch.setitem(config, 'file_enumeration', 'git')
+    with pytest.raises(UnknownFileEnumerationException):
+        list(find_source_files([]))
+
+
+def test_watch_po_files(project):
+    (project / 'foo.py').write_text("gettext('foo')")
+    (project / 'foo.js').write_text("gettext('js')")
+    po_dir = project / 'locale' / 'sv' / 'LC_MESSAGES'
+
+    def changes():
+        (project / 'foo.py').write_text("gettext('foo')\ngettext('bar')")
+        (po_dir / 'djangojs.po').unlink()
+        yield {project / 'foo.py'}
+
+        # No changed strings, so no update
+        (project / 'foo.py').write_text("gettext('foo')  \ngettext('bar')")
+        (project / 'not_source.txt').write_text("gettext('nope')")
+        yield {project / 'foo.py', project / 'not_source.txt'}
+
+        (project / 'new.py').write_text("gettext('new')")
+        (project / 'foo.py').unlink()
+        yield {project / 'foo.py', project / 'new.py'}
+
+    results = watch_po_files(languages=['sv'], changes=changes())
+
+    result = next(results)
+    assert result.new_strings == ['foo', 'js']
+    assert result.stats.files_parsed == 2
+    assert 'msgid "js"' in (po_dir / 'djangojs.po').read_text()
+
+    result = next(results)
+    assert result.new_strings == ['bar']
+    assert 'msgid "bar"' in (po_dir / 'django.po').read_text()
+    # Only the domain that changed is written
+    assert not (po_dir / 'djangojs.po').exists()
+
+    result = next(results)
+    assert result.new_strings == ['new']
+    assert result.newly_obsolete_strings == ['foo', 'bar']
+
+    with pytest.raises(StopIteration):
+        next(results)
+
+
+def test_source_poller(project):
+    (project / 'foo.py').write_text('')
+    (project / 'bar.js').write_text('')
+    (project / 'ignored').mkdir()
+    (project / 'ignored' / 'ignored.py').write_text('')
+    poller = SourcePoller(project, ignore_matcher=IgnoreMatcher(['.*/ignored/.*']))
+    assert poller.poll() == set()
+
+    stat = os.stat(project / 'foo.py')
+    os.utime(project / 'foo.py', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (project / 'bar.js').unlink()
+    (project / 'new' / 'dir').mkdir(parents=True)
+    (project / 'new' / 'dir' / 'new.py').write_text('')
+    (project / 'new' / 'dir' / 'new.txt').write_text('')
+    (project / 'ignored' / 'also_ignored.py').write_text('')
+    assert poller.poll() == {project / 'foo.py', project / 'bar.js', project / 'new' / 'dir' / 'new.py'}
+    assert poller.poll() == set()
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+def test_since(project, monkeypatch):
+    def git(*args):
+        subprocess.run(['git', '-c', 'user.name=okrand', '-c', 'user.email=okrand@example.com', *args], cwd=project, check=True, capture_output=True)
+
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    git('init', '-q')
+    (project / '.gitignore').write_text('.okrand_cache\n')
+    (project / 'foo.py').write_text("gettext('foo')")
+    (project / 'bar.py').write_text("gettext('bar')")
+    git('add', '.')
+    git('commit', '-q', '-m', 'initial')
+
+    assert find_msgids() == (['bar', 'foo'], ExtractionStats(files_parsed=2))
+
+    (project / 'foo.py').write_text("gettext('foo2')")
+    (project / 'new.py').write_text("gettext('new')")
+    assert git_changed_files(project, 'HEAD') == {project / 'foo.py', project / 'new.py'}
+
+    msgids, stats = find_msgids(since='HEAD')
+    assert sorted(msgids) == ['bar', 'foo2', 'new']
+    assert stats == ExtractionStats(files_parsed=2, files_from_cache=1)
+
+    # The cache was built with changes that aren't committed, undoing them is a change too
+    git('checkout', 'foo.py')
+    msgids, stats = find_msgids(since='HEAD')
+    assert sorted(msgids) == ['bar', 'foo', 'new']
+
+    # A commit made after the cache was built isn't trusted blindly: files are checked as usual
+    (project / 'bar.py').write_text("gettext('bar2')")
+    git('add', '.')
+    git('commit', '-q', '-m', 'second')
+    msgids, stats = find_msgids(since='HEAD')
+    assert sorted(msgids) == ['bar2', 'foo', 'new']
+
+    msgids, stats = find_msgids(since='HEAD')
+    assert sorted(msgids) == ['bar2', 'foo', 'new']
+    assert stats == ExtractionStats(files_from_cache=3)
+
+    with pytest.raises(GitException):
+        find_msgids(since='does-not-exist')
+
+
+def test_unique_strings():
+    def strings():
+        for _ in range(1000):
+            yield String(msgid='foo', translation_function='gettext', domain='django')
+            yield String(msgid='bar', translation_function='gettext', domain='django')
+            yield String(msgid='foo', translation_function='gettext', domain='djangojs')
+        yield String(msgid='foo', msgid_plural='foos', translation_function='ngettext', domain='django')
+
+    unique_strings = UniqueStrings(strings())
+    assert len(unique_strings) == 3
+    # First found decides the order, last found wins
+    assert list(unique_strings.string_by_msgid('django').values()) == [
+        String(msgid='foo', msgid_plural='foos', translation_function='ngettext', domain='django'),
+        String(msgid='bar', translation_function='gettext', domain='django'),
+    ]
+    assert list(unique_strings.string_by_msgid('djangojs')) == ['foo']
+    assert unique_strings.string_by_msgid('unknown') == {}
+
+
+def test_lines():
+    assert [x.line for x in parse_python("\n\ngettext('foo')\nx = [\n    _('bar'),\n]")] == [3, 5]
+    assert [x.line for x in parse_js("\ngettext('foo')\n`\n`; _('bar')")] == [2, 4]
+    assert [x.line for x in parse_elm("\n\nx = gettext \"foo\"")] == [3]
+    assert [x.line for x in parse_django_template_tokens("\n{% trans 'foo' %}\n\n{% blocktrans %}\nbar\n{% endblocktrans %}")] == [2, 4]
+
+
+def test_unique_strings_replace():
+    def s(msgid, line, **kwargs):
+        return String(msgid=msgid, translation_function='gettext', domain='django', line=line, **kwargs)
+
+    unique_strings = UniqueStrings([s('model', None)], track_sources=True)
+    unique_strings.add([s('foo', 1), s('bar', 2), s('foo', 3)], path='a.py')
+    unique_strings.add([s('bar', 1)], path='b.py')
+    unique_strings.add([String(msgid='js', translation_function='gettext', domain='djangojs', line=1)], path='c.js')
+    assert unique_strings.occurrences('django', 'foo') == [('a.py', 1), ('a.py', 3)]
+    assert unique_strings.occurrences('django', 'bar') == [('a.py', 2), ('b.py', 1)]
+    assert unique_strings.occurrences('django', 'model') == []
+
+    # Moved to another line
+    assert unique_strings.replace('a.py', [s('foo', 2), s('bar', 3)]) == {'django'}
+    assert unique_strings.replace('a.py', [s('foo', 3), s('bar', 4)], compare_lines=False) == set()
+    assert unique_strings.occurrences('django', 'foo') == [('a.py', 3)]
+
+    # bar is still used in b.py
+    assert unique_strings.replace('a.py', [s('foo', 3)]) == {'django'}
+    assert sorted(unique_strings.string_by_msgid('django')) == ['bar', 'foo', 'model']
+    assert unique_strings.occurrences('django', 'bar') == [('b.py', 1)]
+
+    # The last string found wins
+    assert unique_strings.replace('a.py', [s('foo', 3), s('bar', 4, msgid_plural='bars')]) == {'django'}
+    assert unique_strings.string_by_msgid('django')['bar'].msgid_plural == 'bars'
+    assert unique_strings.replace('a.py', [s('foo', 3)]) == {'django'}
+    assert unique_strings.string_by_msgid('django')['bar'].msgid_plural is None
+
+    assert unique_strings.replace('b.py', []) == {'django'}
+    assert list(unique_strings.string_by_msgid('django')) == ['model', 'foo']
+    assert unique_strings.replace('b.py', []) == set()
+    assert list(unique_strings.string_by_msgid('djangojs')) == ['js']
+
+
+def test_occurrences(project, monkeypatch):
+    (project / 'sub').mkdir()
+    (project / 'sub' / 'foo.py').write_text("\ngettext('foo')\ngettext('bar')")
+    (project / 'bar.js').write_text("gettext('bar')")
+    (project / 'baz.py').write_text("gettext('bar')")
+    po_path = project / 'locale' / 'sv' / 'LC_MESSAGES' / 'django.po'
+
+    update_po_files(languages=['sv'])
+    assert '#:' not in po_path.read_text()
+
+    monkeypatch.setitem(config, 'occurrences', '1')
+    update_po_files(languages=['sv'])
+    po = pofile(str(po_path))
+    assert po.find('foo').occurrences == [('sub/foo.py', '2')]
+    assert sorted(po.find('bar').occurrences) == [('baz.py', '1'), ('sub/foo.py', '3')]
+
+
+def test_string_index(project, monkeypatch):
+    import pickle
+
+    def s(msgid, line, domain='django'):
+        return String(msgid=msgid, translation_function='gettext', domain=domain, line=line)
+
+    unique_strings = UniqueStrings([s('model', None)], track_sources=True)
+    unique_strings.add([s('foo', 1), s('bar', 2), s('foo', 1, domain='djangojs')], path='a.py')
+    index = StringIndex.build(unique_strings, with_occurrences=True)
+    assert StringIndex.build(index) is index
+    assert list(index.string_by_msgid('django')) == ['model', 'foo', 'bar']
+    assert index.occurrences('django', 'bar') == (('a.py', '2'),)
+    assert index.occurrences('django', 'model') == ()
+    with pytest.raises(TypeError):
+        index.string_by_msgid('django')['baz'] = s('baz', 3)
+
+    # Doesn't change with the strings it was built from
+    unique_strings.add([s('baz', 3)], path='b.py')
+    assert 'baz' not in index.string_by_msgid('django')
+    assert pickle.loads(pickle.dumps(index)) == index
+
+    # Built once, not once per language
+    (project / 'foo.py').write_text("gettext('foo')")
+    monkeypatch.setitem(config, 'occurrences', '1')
+    builds = []
+    original_build = StringIndex.build.__func__
+    monkeypatch.setattr(StringIndex, 'build', classmethod(lambda cls, strings, **kwargs: builds.append(strings) or original_build(cls, strings, **kwargs)))
+    update_po_files(languages=['sv', 'en', 'tlh'])
+    assert len([x for x in builds if not isinstance(x, StringIndex)]) == 1
+    po = pofile(str(project / 'locale' / 'tlh' / 'LC_MESSAGES' / 'django.po'))
+    assert po.find('foo').occurrences == [('foo.py', '1')]
+
+
+def test_read_ahead(project, monkeypatch):
+    import okrand
+
+    for i in range(10):
+        (project / f'foo{i}.py').write_text(f"gettext('foo{i}')\n")
+    (project / 'copy.py').write_text("gettext('foo3')\n")
+    (project / 'nothing.py').write_text("x = 1\n")
+
+    monkeypatch.setitem(config, 'read_ahead', '0')
+    expected = find_msgids()
+    monkeypatch.setitem(config, 'read_ahead', '2')
+    assert find_msgids() == expected
+    assert expected[1] == ExtractionStats(files_parsed=10, files_deduplicated=1, files_skipped_by_prefilter=1)
+    assert 'Waited' in expected[1].summary()
+
+    # Only `read_ahead` files are read before they are parsed
+    read = []
+    original_read_source_ahead = okrand.read_source_ahead
+    monkeypatch.setattr(okrand, 'read_source_ahead', lambda full_path: read.append(full_path) or original_read_source_ahead(full_path))
+    results = okrand.extract_files(sorted(project.glob('*.py')), cache=okrand.ExtractionCache(), stats=ExtractionStats())
+    next(results)
+    # The reads run in threads, so the ones after the first might not have started yet
+    assert 1 <= len(read) <= 3
+    assert len(list(results)) == 11
+    assert len(read) == 12
+
+
+def test_guards(project, monkeypatch):
+    (project / 'big.py').write_text("gettext('big')\n" * 100)
+    (project / 'bundle.min.js').write_text("gettext('minified');" * 40)
+    (project / 'generated.py').write_text("# Generated by Django 4.2 on 2023-01-01\ngettext('generated')")
+    (project / 'allowed.min.js').write_text("gettext('allowed');" * 100)
+    (project / 'normal.py').write_text("gettext('normal')")
+
+    msgids, stats = find_msgids()
+    assert stats.files_parsed == 5
+    assert 'Skipped' not in stats.summary()
+
+    monkeypatch.setitem(config, 'max_file_size', '1000')
+    monkeypatch.setitem(config, 'skip_minified', '1')
+    monkeypatch.setitem(config, 'max_average_line_length', '100')
+    monkeypatch.setitem(config, 'skip_generated', '1')
+    monkeypatch.setitem(config, 'guard_allow', '.*/allowed.*')
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+
+    for _ in range(2):
+        msgids, stats = find_msgids()
+        assert set(msgids) == {'allowed', 'normal'}
+        assert stats.files_skipped_by_guard == {
+            str(project / 'big.py'): 'larger than max_file_size (1500 bytes)',
+            str(project / 'bundle.min.js'): 'minified (average line length 800)',
+            str(project / 'generated.py'): 'generated ("Generated by" in the header)',
+        }
+        assert stats.summary().startswith('Extracted strings from 5 files')
+        assert f'\n    {project / "big.py"}: larger than max_file_size (1500 bytes)' in stats.summary()
+
+
+def test_guards_after_cached_run(project, monkeypatch):
+    (project / 'big.py').write_text("gettext('big')\n" * 100)
+    (project / 'bundle.min.js').write_text("gettext('minified');" * 40)
+    (project / 'generated.py').write_text("# Generated by Django 4.2 on 2023-01-01\ngettext('generated')")
+    (project / 'normal.py').write_text("gettext('normal')")
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    assert find_msgids()[1] == ExtractionStats(files_parsed=4)
+    assert find_msgids()[1] == ExtractionStats(files_from_cache=4)
+
+    # Turning on the guards starts a new cache, so cached files are checked by them too
+    monkeypatch.setitem(config, 'skip_minified', '1')
+    monkeypatch.setitem(config, 'max_average_line_length', '100')
+    msgids, stats = find_msgids()
+    assert 'minified' not in msgids
+    assert list(stats.files_skipped_by_guard) == [str(project / 'bundle.min.js')]
+
+    monkeypatch.setitem(config, 'skip_generated', '1')
+    monkeypatch.setitem(config, 'max_file_size', '1000')
+    msgids, stats = find_msgids()
+    assert msgids == ['normal']
+
+    # Also with --since, which uses cache entries without looking at the files
+    for args in [['init', '-q'], ['add', '.'], ['commit', '-q', '-m', 'initial']]:
+        subprocess.run(['git', '-c', 'user.name=okrand', '-c', 'user.email=okrand@example.com', *args], cwd=project, check=True, capture_output=True)
+    monkeypatch.delitem(config, 'skip_generated')
+    assert sorted(find_msgids(since='HEAD')[0]) == ['generated', 'normal']
+    monkeypatch.setitem(config, 'skip_generated', '1')
+    assert find_msgids(since='HEAD')[0] == ['normal']
+
+
+def test_mmap_large_files(project, monkeypatch):
+    import okrand
+
+    (project / 'big.js').write_text("// padding\n" * 100 + "gettext('mapped')\n")
+    (project / 'small.js').write_text("gettext('read')\n")
+    monkeypatch.setitem(config, 'mmap_threshold', '1000')
+
+    # The big file is scanned from the mapped bytes, without decoding the whole file
+    decoded = []
+    original_decode_source = okrand.decode_source
+    monkeypatch.setattr(okrand, 'decode_source', lambda data: decoded.append(data) or original_decode_source(data))
+
+    msgids, stats = find_msgids()
+    assert sorted(msgids) == ['mapped', 'read']
+    assert decoded == [b"gettext('read')\n"]
+
+
+def test_mmap_non_ascii(project, monkeypatch):
+    # Characters that are more than one byte in UTF-8 everywhere: in strings, comments, names, regexes and templates
+    js = "// «ünïcödé» — ∑\nconst größe = 'ä' + \"€\" / 2; /* ☃ */ x = /ö+/.test(`ü${größe}`);\n" * 1000
+    (project / 'big.js').write_text(js + "gettext('größe ☃')\n", encoding='utf-8')
+    (project / 'big.vue').write_text(
+        '<template>\n' + '<p title="ö">ü {{ größe }}</p>\n' * 1000 + '<p>{{ $gettext("vue ☃") }}</p>\n</template>\n'
+        + '<script>\n' + js + "gettext('script ü')\n</script>\n<style>/* « */</style>\n",
+        encoding='utf-8',
+    )
+    (project / 'big.elm').write_text('-- «ünïcödé»\nx = "ä" ++ größe\n' * 1000 + 'y = gettext "elm €"\n', encoding='utf-8')
+    monkeypatch.setitem(config, 'mmap_threshold', '1000')
+
+    strings = list(find_source_strings(ignore_list=[]))
+    assert sorted(x.msgid for x in strings) == ['elm €', 'größe ☃', 'script ü', 'vue ☃']
+    # Line numbers are counted from the start of the file, also for the Vue sections
+    assert sorted(x.line for x in strings if x.msgid in ('vue ☃', 'script ü')) == [1002, 3005]
+
+
+def line_extractor(content):
+    for line in content.splitlines():
+        if line.startswith('translate: '):
+            yield String(msgid=line[len('translate: '):], translation_function='line', domain='django')
+
+
+def test_extractor_registry(project):
+    loaded = []
+
+    def load(name):
+        def loader():
+            loaded.append(name)
+            return line_extractor
+        return loader
+
+    registry = ExtractorRegistry()
+    registry.register('frontend/*.js', name='glob', load=load('glob'))
+    registry.register('.txt', name='txt', load=load('txt'))
+    registry.register('.js', name='js', load=load('js'))
+    registry.register('*.txt', name='late glob', load=load('late glob'))
+
+    assert registry.find(project / 'frontend' / 'foo.js').name == 'glob'
+    assert registry.find(project / 'other' / 'foo.js').name == 'js'
+    assert registry.find(project / 'foo.txt').name == 'txt'
+    assert registry.find(project / 'foo.py') is None
+    assert not registry.matches(project / 'foo.py')
+    assert loaded == []
+
+    assert registry.get(project / 'foo.txt') is line_extractor
+    assert registry.get(project / 'bar.txt') is line_extractor
+    assert loaded == ['txt']
+
+
+def test_extractors_conf(project, monkeypatch, request):
+    import okrand
+
+    # The registry is cached per value of the extractors setting, and we replace the entry points
+    okrand._extractor_registry.cache_clear()
+    request.addfinalizer(okrand._extractor_registry.cache_clear)
+
+    (project / 'foo.txt').write_text('translate: foo\nnope\ntranslate: bar')
+    (project / 'templates').mkdir()
+    (project / 'templates' / 'page.jinja2').write_text('translate: page')
+    (project / 'other.jinja2').write_text('translate: not matched')
+    (project / 'foo.py').write_text("gettext('python')")
+
+    entry_point_loads = []
+
+    class EntryPoint:
+        name = '.txt'
+        value = 'some_package:some_extractor'
+
+        def load(self):
+            entry_point_loads.append(self.value)
+            return line_extractor
+
+    monkeypatch.setattr(okrand, 'entry_points', lambda group: [EntryPoint()] if group == 'okrand.extractors' else [])
+    monkeypatch.setitem(config, 'extractors', '\n.txt = tests.test_base.line_extractor\ntemplates/*.jinja2 = tests.test_base:line_extractor')
+
+    assert sorted(find_msgids()[0]) == ['bar', 'foo', 'page', 'python']
+    # setup.cfg wins over the entry point
+    assert entry_point_loads == []
+
+    monkeypatch.setitem(config, 'extractors', '')
+    assert sorted(find_msgids()[0]) == ['bar', 'foo', 'python']
+    assert entry_point_loads == ['some_package:some_extractor']
+
+
+def test_builtin_extractor_settings(project, monkeypatch):
+    import okrand
+
+    # Read when used, so changing them takes effect, and a bad one doesn't break importing okrand
+    monkeypatch.setitem(config, 'js_extractor', 'regex')
+    assert okrand.get_extractor_registry().get(project / 'foo.js') is okrand.parse_js_regex
+
+    monkeypatch.setitem(config, 'js_extractor', 'does_not_exist')
+    with pytest.raises(okrand.UnknownExtractorException):
+        okrand.get_extractor_registry()
+
+
+def test_model_strings_cache(project, monkeypatch):
+    import sys
+
+    monkeypatch.setitem(config, 'django_model_upgrade', '1')
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    expected = sorted(x.msgid for x in translations_for_all_models())
+    assert expected
+
+    msgids, stats = find_msgids()
+    assert sorted(msgids) == expected
+    assert stats.models_from_cache is False
+    assert 'Model strings: extracted' in stats.summary()
+
+    msgids, stats = find_msgids()
+    assert sorted(msgids) == expected
+    assert stats.models_from_cache is True
+    assert 'Model strings: from cache' in stats.summary()
+
+    # Changing the source of a models module changes the fingerprint
+    models_module = sys.modules['tests.models']
+    models_copy = project / 'models_copy.py'
+    models_copy.write_text(Path(models_module.__file__).read_text())
+    monkeypatch.setattr(models_module, '__file__', str(models_copy))
+    # Same content, same fingerprint
+    assert find_msgids()[1].models_from_cache is True
+    models_copy.write_text(models_copy.read_text() + '\n# changed\n')
+    assert find_msgids()[1].models_from_cache is False
+
+
+plugin_threads = []
+
+
+def schema_plugin(*, ignore_list):
+    from django.conf import settings
+
+    plugin_threads.append(threading.current_thread())
+    for path in sorted(Path(settings.BASE_DIR).glob('*.schema')):
+        yield String(msgid=path.read_text().strip(), translation_function='schema', domain='django')
+
+
+def schema_plugin_cache_key(*, ignore_list):
+    from django.conf import settings
+
+    return files_digest(Path(settings.BASE_DIR).glob('*.schema'))
+
+
+schema_plugin.cache_key = schema_plugin_cache_key
+
+
+def test_plugins(project, monkeypatch):
+    (project / 'foo.schema').write_text('from schema')
+    (project / 'foo.py').write_text("gettext('from source')")
+    monkeypatch.setitem(config, 'find_source_strings_plugins', 'tests.test_base.schema_plugin')
+    plugin_threads.clear()
+
+    # Plugins run in their own threads, but their strings still come first
+    msgids, stats = find_msgids()
+    assert msgids == ['from schema', 'from source']
+    assert plugin_threads[0] is not threading.main_thread()
+    assert list(stats.plugin_seconds) == ['tests.test_base.schema_plugin']
+    assert 'Plugin tests.test_base.schema_plugin: ' in stats.summary()
+
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    plugin_threads.clear()
+    assert find_msgids()[0] == ['from schema', 'from source']
+    msgids, stats = find_msgids()
+    assert msgids == ['from schema', 'from source']
+    assert len(plugin_threads) == 1
+    assert 'Plugin tests.test_base.schema_plugin: from cache' in stats.summary()
+
+    # A changed input changes the cache key
+    (project / 'foo.schema').write_text('changed schema')
+    msgids, stats = find_msgids()
+    assert msgids == ['changed schema', 'from source']
+    assert len(plugin_threads) == 2
+    assert stats.plugins_from_cache == set()
+
+
+def test_memory_cache_is_bounded(project, monkeypatch):
+    import okrand
+
+    monkeypatch.setattr(okrand, 'MEMORY_CACHE_CONTENTS', 2)
+    for i in range(5):
+        (project / f'{i}.py').write_text(f"gettext('{i}')")
+    (project / 'copy_of_0.py').write_text("gettext('0')")
+    (project / 'copy_of_4.py').write_text("gettext('4')")
+
+    cache = okrand.ExtractionCache()
+    stats = ExtractionStats()
+    results = list(okrand.extract_files(sorted(project.glob('*.py')), cache=cache, stats=stats))
+    assert [x.msgid for _, strings in results for x in strings] == ['0', '1', '2', '3', '4', '0', '4']
+    # 0.py was parsed too long ago, 4.py recently enough
+    assert stats == ExtractionStats(files_parsed=6, files_deduplicated=1)
+    assert len(cache.strings_by_content) == 2
+    assert cache.entries == {}
+
+
+def test_content_deduplication(project, monkeypatch):
+    for app in ['a', 'b', 'c']:
+        (project / app).mkdir()
+        (project / app / 'vendored.js').write_text("gettext('vendored')")
+    (project / 'a' / 'other.js').write_text("gettext('other')")
+    # Same content, but another extractor
+    (project / 'a' / 'vendored.py').write_text("gettext('vendored')")
+
+    serial = find_msgids()
+    assert sorted(serial[0]) == ['other', 'vendored', 'vendored', 'vendored', 'vendored']
+    assert serial[1] == ExtractionStats(files_parsed=3, files_deduplicated=2)
+    assert sorted(find_msgids(jobs=3)[0]) == sorted(serial[0])
+    assert find_msgids(jobs=3)[1] == serial[1]
+
+    monkeypatch.setitem(config, 'cache_dir', '.okrand_cache')
+    assert find_msgids()[1] == ExtractionStats(files_parsed=3, files_deduplicated=2)
+    assert find_msgids()[1] == ExtractionStats(files_from_cache=5)
+
+    # A new copy is found by content
+    (project / 'd').mkdir()
+    (project / 'd' / 'vendored.js').write_text("gettext('vendored')")
+    assert find_msgids()[1] == ExtractionStats(files_from_cache=6)
+
+    # Like switching to another branch and back
+    (project / 'a' / 'other.js').write_text("gettext('changed')")
+    assert find_msgids()[1] == ExtractionStats(files_parsed=1, files_from_cache=5)
+    (project / 'a' / 'other.js').write_text("gettext('other')")
+    msgids, stats = find_msgids(jobs=3)
+    assert 'other' in msgids
+    assert stats == ExtractionStats(files_from_cache=6)